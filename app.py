@@ -1,13 +1,35 @@
 # 必要ライブラリ（コマンドプロンプトでインストール）
 # python -m pip install streamlit streamlit-authenticator pandas plotly gspread google-auth bcrypt
 
+import glob
+import hashlib
 import json
+import os
+import pickle
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, date
 
 import bcrypt
 import gspread
 import pandas as pd
+
+try:
+    import orjson  # JSON 列のパース高速化（任意依存）
+except ImportError:
+    orjson = None
+
+# テキスト列に使う string dtype。pyarrow は Streamlit 自体の依存なので
+# 通常は入っているが、無い環境では従来の nullable string にフォールバック
+try:
+    import pyarrow  # noqa: F401
+
+    _STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    _STRING_DTYPE = "string"
 import plotly.graph_objects as go
 import streamlit as st
 import streamlit.components.v1 as components
@@ -77,6 +99,41 @@ SHEET_SCHEMAS = {
     ],
 }
 
+# JSON 文字列として保存しているカラム（読み込み時に一度だけパースする）
+JSON_COLUMNS = {
+    "exam_results": ["results_json"],
+    "coaching_reports": [
+        "student_eval_json",
+        "teacher_eval_json",
+        "study_schedule_json",
+        "study_targets_json",
+    ],
+    "eiken_records": ["scores_json"],
+}
+
+
+def _parse_json_cell(s):
+    """セルの JSON 文字列を dict/list に変換（空・不正値は {}）"""
+    if not s:
+        return {}
+    try:
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+    except Exception:
+        return {}
+
+
+def _dumps(obj) -> str:
+    """シート保存用の JSON 文字列化（orjson があれば C 実装を使う）。
+
+    orjson は非 ASCII をそのまま出力するため ensure_ascii=False と等価。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False)
+
+
 # ---------- Google Sheets クライアント ----------
 
 @st.cache_resource
@@ -104,52 +161,98 @@ def get_spreadsheet():
         st.stop()
 
 
-@st.cache_data(ttl=60)
-def load_all_tables():
-    """全ワークシートをまとめて DataFrame 化（60秒キャッシュ）"""
-    sh = get_spreadsheet()
+# 一時的エラーとして再試行してよい HTTP ステータス
+_RETRYABLE_STATUSES = (429, 500, 503)
 
-    tables = {}
 
-    # students
-    try:
-        ws_students = sh.worksheet("students")
-        rec_students = ws_students.get_all_records()
-        tables["students"] = pd.DataFrame(rec_students)
-    except Exception:
-        tables["students"] = pd.DataFrame()
+def _retry_api(call, *args, **kwargs):
+    """gspread 呼び出しを指数バックオフで再試行する。
 
-    # exam_results
-    try:
-        ws_exam = sh.worksheet("exam_results")
-        rec_exam = ws_exam.get_all_records()
-        tables["exam_results"] = pd.DataFrame(rec_exam)
-    except Exception:
-        tables["exam_results"] = pd.DataFrame()
+    レート制限（429）や Google 側の一時障害（500/503）で即座に
+    アプリ全体を落とさないための薄いラッパー。それ以外のエラーと
+    最終試行の失敗はそのまま送出する。
+    """
+    for attempt in range(5):
+        try:
+            return call(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in _RETRYABLE_STATUSES or attempt == 4:
+                raise
+            time.sleep(2 ** attempt + random.random())
 
-    # coaching_reports
-    try:
-        ws_coach = sh.worksheet("coaching_reports")
-        rec_coach = ws_coach.get_all_records()
-        tables["coaching_reports"] = pd.DataFrame(rec_coach)
-    except Exception:
-        tables["coaching_reports"] = pd.DataFrame()
 
-    # eiken_records
-    try:
-        ws_eiken = sh.worksheet("eiken_records")
-        rec_eiken = ws_eiken.get_all_records()
-        tables["eiken_records"] = pd.DataFrame(rec_eiken)
-    except Exception:
-        tables["eiken_records"] = pd.DataFrame()
+@st.cache_data(ttl=60)
+def load_all_tables():
+    """全ワークシートをまとめて DataFrame 化（60秒キャッシュ）
 
-    # users
-    try:
-        ws_users = sh.worksheet("users")
-        rec_users = ws_users.get_all_records()
-        tables["users"] = pd.DataFrame(rec_users)
-    except Exception:
-        tables["users"] = pd.DataFrame()
+    シートごとに get_all_records() を呼ぶと HTTP 往復が5回発生するため、
+    values_batch_get で1回の API 呼び出しにまとめる。更新時刻が一致する
+    ディスクキャッシュのあるシートはそこから復元し、足りない分だけ取得する
+    （書き込み直後は _finish_sheet_write が結果を載せ直すので再取得ゼロ）。
+    """
+    modified_time = get_spreadsheet_modified_time()
+
+    tables = {}
+    fetch_names = []
+    for name in SHEET_NAMES:
+        cached = _disk_cache_load(name, modified_time)
+        if cached is not None:
+            tables[name] = cached
+        else:
+            fetch_names.append(name)
+
+    if fetch_names:
+        sh = get_spreadsheet()
+        fetched = {}
+        try:
+            resp = _retry_api(
+                sh.values_batch_get, ranges=[f"{name}!A:Z" for name in fetch_names]
+            )
+            value_ranges = resp.get("valueRanges", [])
+            for i, name in enumerate(fetch_names):
+                fetched[name] = (
+                    value_ranges[i].get("values", []) if i < len(value_ranges) else []
+                )
+        except Exception:
+            # batchGet は全範囲一括で失敗するため、シート単位の取得に切り替えて
+            # 1シートの不調が全シートを道連れにしないようにする
+            fetched = None
+
+        for name in fetch_names:
+            cacheable = True
+            if fetched is not None:
+                values = fetched[name]
+            else:
+                try:
+                    values = _retry_api(get_worksheet(name).get_all_values)
+                except Exception:
+                    # 取得に失敗したシートだけ空で返す。失敗由来の空フレームを
+                    # ディスクキャッシュへ載せると modifiedTime が変わるまで
+                    # 空のまま固定されてしまうため、保存はしない
+                    values = []
+                    cacheable = False
+
+            if len(values) < 2:
+                df = pd.DataFrame(columns=SHEET_SCHEMAS[name])
+            else:
+                # 1行目をヘッダー、2行目以降をデータとして DataFrame 化
+                header = values[0]
+                rows = [row + [""] * (len(header) - len(row)) for row in values[1:]]
+                df = pd.DataFrame(rows, columns=header)
+
+            tables[name] = _postprocess_sheet_df(df, name)
+            if cacheable:
+                _disk_cache_store(name, modified_time, tables[name])
+
+    # 生徒別参照の多いシートは行インデックスを事前にグループ化しておき、
+    # ページ側の boolean マスク全走査を dict 参照に置き換える
+    for name in ("exam_results", "coaching_reports", "eiken_records"):
+        df = tables[name]
+        if not df.empty and "student_id" in df.columns:
+            tables[name + "_by_student"] = df.groupby("student_id", sort=False).groups
+        else:
+            tables[name + "_by_student"] = {}
 
     return tables
 
@@ -217,16 +320,65 @@ def init_sheets():
         ],
     }
 
-    existing_titles = [ws.title for ws in sh.worksheets()]
+    existing_titles = [ws.title for ws in _retry_api(sh.worksheets)]
 
-    for sheet_name, headers in required_sheets.items():
-        if sheet_name not in existing_titles:
-            ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=max(len(headers), 20))
-            ws.append_row(headers)
+    missing = {
+        name: headers
+        for name, headers in required_sheets.items()
+        if name not in existing_titles
+    }
+    if not missing:
+        return
+
+    # 不足シートの作成は1回の batchUpdate にまとめる
+    # （add_worksheet + append_row をシートごとに繰り返さない）
+    sh.batch_update(
+        {
+            "requests": [
+                {
+                    "addSheet": {
+                        "properties": {
+                            "title": name,
+                            "gridProperties": {
+                                "rowCount": 1000,
+                                "columnCount": max(len(headers), 20),
+                            },
+                        }
+                    }
+                }
+                for name, headers in missing.items()
+            ]
+        }
+    )
+
+    # ヘッダー行も1回の values_batch_update でまとめて書き込む
+    sh.values_batch_update(
+        {
+            "valueInputOption": "RAW",
+            "data": [
+                {"range": f"{name}!A1", "values": [headers]}
+                for name, headers in missing.items()
+            ],
+        }
+    )
+
+
+
+@st.cache_resource
+def _sheets_initialized() -> bool:
+    """シートの存在チェック・作成をプロセス内で一度だけ実行する。
 
+    init_sheets は全ワークシートの一覧取得 API を呼ぶため、
+    セッションごとではなくワーカープロセスごとに1回で十分。
+    """
+    init_sheets()
+    return True
 
 
+@st.cache_resource
 def get_worksheet(name: str):
+    # sh.worksheet() は内部でシートのメタデータ取得 API を呼ぶため、
+    # Worksheet オブジェクト自体をプロセス内でキャッシュする
     sh = get_spreadsheet()
     try:
         ws = sh.worksheet(name)
@@ -239,45 +391,417 @@ def get_worksheet(name: str):
     return ws
 
 
+# ---------- ディスクキャッシュ（Sheets 読み込みの2段キャッシュ） ----------
+
+DISK_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ubase")
+
+
+@st.cache_data(ttl=60)
+def get_spreadsheet_modified_time() -> str:
+    """スプレッドシートの最終更新時刻を Drive API から取得（60秒キャッシュ）。
+
+    取得できない環境（スコープ不足など）では空文字を返し、
+    ディスクキャッシュは使わずメモリキャッシュのみで動作する。
+    """
+    try:
+        return str(get_spreadsheet().lastUpdateTime or "")
+    except Exception:
+        return ""
+
+
+def _disk_cache_path(sheet_name: str, modified_time: str) -> str:
+    safe_time = modified_time.replace(":", "-").replace("/", "-")
+    return os.path.join(DISK_CACHE_DIR, f"{sheet_name}__{safe_time}.pkl")
+
+
+def _disk_cache_load(sheet_name: str, modified_time: str):
+    """更新時刻が一致するキャッシュがあれば DataFrame を返す（無ければ None）"""
+    if not modified_time:
+        return None
+    try:
+        with open(_disk_cache_path(sheet_name, modified_time), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _disk_cache_drop(sheet_name: str):
+    """指定シートのディスクキャッシュを全世代削除する"""
+    for path in glob.glob(os.path.join(DISK_CACHE_DIR, f"{sheet_name}__*.pkl")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _disk_cache_store(sheet_name: str, modified_time: str, df: pd.DataFrame):
+    if not modified_time:
+        return
+    try:
+        os.makedirs(DISK_CACHE_DIR, exist_ok=True)
+        # 同じシートの古い世代は無効なので削除しておく
+        for old in glob.glob(os.path.join(DISK_CACHE_DIR, f"{sheet_name}__*.pkl")):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        with open(_disk_cache_path(sheet_name, modified_time), "wb") as f:
+            pickle.dump(df, f)
+    except Exception:
+        # キャッシュ書き込みの失敗は動作に影響させない
+        pass
+
+
+def invalidate_sheet_cache(sheet_name: str | None = None):
+    """書き込んだシートのキャッシュだけを無効化する。
+
+    Streamlit が引数スコープの clear に対応していれば該当シートのみ、
+    非対応なら従来どおり全シート分を破棄する。書き込み直後に古い
+    modifiedTime でディスクキャッシュを拾わないよう、そちらも消しておく。
+    """
+    try:
+        if sheet_name is not None:
+            load_sheet_df.clear(sheet_name)
+        else:
+            load_sheet_df.clear()
+    except Exception:
+        try:
+            load_sheet_df.clear()
+        except Exception:
+            pass
+    try:
+        load_all_tables.clear()
+    except Exception:
+        pass
+    try:
+        get_spreadsheet_modified_time.clear()
+    except Exception:
+        pass
+    if sheet_name is not None:
+        _disk_cache_drop(sheet_name)
+
+
+def _finish_sheet_write(sheet_name: str, df: pd.DataFrame | None):
+    """書き込み成功後のキャッシュ後始末。
+
+    メモリキャッシュは破棄するが、書き込んだ結果そのもの（df）を
+    新しい modifiedTime でディスクキャッシュへ載せ直す。他シートの
+    内容は今回の書き込みでは変わっていないので世代キーだけ揃える。
+    これで直後の rerun は Sheets への再取得なしにローカルから復元できる。
+    df が None の場合（ローカル反映を組み立てられなかった場合）は
+    従来どおり破棄だけ行い、次回の読み込みで再取得させる。
+    """
+    invalidate_sheet_cache(sheet_name)
+    if df is None:
+        return
+    try:
+        modified_time = get_spreadsheet_modified_time()
+        if not modified_time:
+            return
+        # 絞り込み済みフレーム（行削除後など）は index に欠番が残っている。
+        # 読み出し側は index＝行位置（A{index+2}）として扱うため、
+        # キャッシュへ載せる前に必ず振り直す。
+        df = df.reset_index(drop=True)
+        _disk_cache_store(sheet_name, modified_time, _postprocess_sheet_df(df, sheet_name))
+        for other in SHEET_NAMES:
+            if other == sheet_name:
+                continue
+            new_path = _disk_cache_path(other, modified_time)
+            for path in glob.glob(os.path.join(DISK_CACHE_DIR, f"{other}__*.pkl")):
+                if path != new_path:
+                    try:
+                        os.replace(path, new_path)
+                    except OSError:
+                        pass
+    except Exception:
+        # ローカル反映に失敗しても、破棄済みなので次回読み込みで正しくなる
+        _disk_cache_drop(sheet_name)
+
+
 # ---------- DataFrame 読み書き共通関数 ----------
 
 def _ensure_columns(df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
     cols = SHEET_SCHEMAS[sheet_name]
-    for c in cols:
-        if c not in df.columns:
-            df[c] = ""
-    return df[cols]
+    # 既にスキーマ通りならコピーを作らずそのまま返す（通常パス）
+    if list(df.columns) == cols:
+        return df
+    # 列の過不足・並び替えは reindex 1回で済ませる（欠損列は "" 埋め）
+    return df.reindex(columns=cols, fill_value="")
 
 
 @st.cache_data(ttl=300)
 def load_sheet_df(sheet_name: str) -> pd.DataFrame:
+    # シートが変わっていなければネットワークを使わずディスクキャッシュから復元
+    modified_time = get_spreadsheet_modified_time()
+    cached = _disk_cache_load(sheet_name, modified_time)
+    if cached is not None:
+        return cached
+
     ws = get_worksheet(sheet_name)
-    records = ws.get_all_records()
-    if not records:
+    # get_all_records() は行ごとに dict を組み立てるため大きなシートで遅い。
+    # get_all_values() で2次元配列を一括取得して DataFrame を一度に構築する。
+    values = _retry_api(ws.get_all_values)
+    if len(values) < 2:
         df = pd.DataFrame(columns=SHEET_SCHEMAS[sheet_name])
     else:
-        df = pd.DataFrame(records)
-        df = _ensure_columns(df, sheet_name)
+        header = values[0]
+        rows = [row + [""] * (len(header) - len(row)) for row in values[1:]]
+        df = pd.DataFrame(rows, columns=header)
+
+    df = _postprocess_sheet_df(df, sheet_name)
+
+    _disk_cache_store(sheet_name, modified_time, df)
     return df
 
 
-def write_sheet_df(sheet_name: str, df: pd.DataFrame):
+def _postprocess_sheet_df(df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
+    """読み込んだシートにスキーマ保証・JSON パースなどの共通後処理を適用する。
+
+    load_sheet_df と load_all_tables の両方から使う。
+    """
+    df = _ensure_columns(df, sheet_name)
+
+    # テキスト列は Arrow backed string に寄せる（pyarrow があれば）。
+    # object dtype の Python str セルよりメモリが小さく、比較・ソートが
+    # C カーネルで走る。category 化する列はこの後の変換に任せる。
+    text_cols = [
+        c
+        for c in SHEET_SCHEMAS[sheet_name]
+        if c not in SHEET_CATEGORY_COLUMNS.get(sheet_name, {})
+    ]
+    df[text_cols] = df[text_cols].astype(_STRING_DTYPE)
+
+    # id 系の列は読み込み時に文字列へ統一し、各ページでの astype(str) を不要にする
+    for col in ("id", "student_id"):
+        if col in df.columns:
+            df[col] = df[col].fillna("")
+
+    # JSON 列はここで一度だけパースしておき、各ページでの再パースを不要にする
+    for col in JSON_COLUMNS.get(sheet_name, []):
+        df[col + "_parsed"] = df[col].map(_parse_json_cell)
+
+    # exam_results は科目ごとのスコアを数値列に展開しておく。
+    # 「results.<科目>.score / .target」列として参照でき、描画側で
+    # 行ごとに dict を剥がす必要がなくなる（書き込み時はスキーマ外なので落ちる）。
+    if sheet_name == "exam_results" and not df.empty:
+        wide = pd.json_normalize(df["results_json_parsed"]).set_axis(df.index)
+        if not wide.empty:
+            wide = wide.apply(pd.to_numeric, errors="coerce")
+            wide.columns = ["results." + c for c in wide.columns]
+            df = df.join(wide)
+
+    # eiken_records も同様に技能別スコアを数値列に展開しておく。
+    # 「scores.<技能>.correct / .total」列として参照できる。
+    if sheet_name == "eiken_records" and not df.empty:
+        wide = pd.json_normalize(df["scores_json_parsed"]).set_axis(df.index)
+        if not wide.empty:
+            wide = wide.apply(pd.to_numeric, errors="coerce")
+            wide.columns = ["scores." + c for c in wide.columns]
+            df = df.join(wide)
+
+    # id → 行位置の辞書を attrs に添付し、更新・削除ハンドラでの
+    # boolean マスク全走査を O(1) の辞書参照に置き換える
+    if "id" in df.columns:
+        df.attrs["id_index"] = dict(zip(df["id"], df.index))
+    if sheet_name == "coaching_reports":
+        # 同一生徒・同一日付の上書き判定用
+        df.attrs["sid_date_index"] = dict(
+            zip(zip(df["student_id"], df["date"]), df.index)
+        )
+
+    # 取りうる値が限られる列は category dtype にしてメモリとフィルタコストを抑える。
+    # 既知の選択肢はカテゴリに追加しておき、編集・進級での代入が失敗しないようにする。
+    for col, known_values in SHEET_CATEGORY_COLUMNS.get(sheet_name, {}).items():
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+            extra = [v for v in known_values if v not in df[col].cat.categories]
+            if extra:
+                df[col] = df[col].cat.add_categories(extra)
+
+    return df
+
+
+def _df_to_rows(df: pd.DataFrame) -> list:
+    """行リストへ変換する。文字列セルはコピーせずそのまま流用し、
+    文字列 ndarray 全体を中間生成しない（大きな results_json 列対策）。"""
+    if df.empty:
+        return []
+    return [
+        [
+            ""
+            if v is None or (not isinstance(v, str) and pd.isna(v))
+            else (v if isinstance(v, str) else str(v))
+            for v in row
+        ]
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def _upload_sheet_df(sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """シートへの送信だけを行い、キャッシュ後始末はしない。
+
+    複数シートを並列に書き込むとき、_finish_sheet_write を呼び出し側で
+    直列に実行できるよう分離してある。送信した内容のフレームを返す。
+    """
     df = _ensure_columns(df.copy(), sheet_name)
+    # RAW 指定でサーバー側の数式パースもスキップ。
+    new_rows = _df_to_rows(df)
+
+    # 行数が変わらない書き込み（1行編集・一括進級など）は、直前のキャッシュと
+    # 差分を取り、変わった行だけを1回の batchUpdate で送る。差分が大きい・
+    # 行数が変わった・キャッシュが無い場合は従来どおり全体を書き直す。
+    if _write_changed_rows_only(sheet_name, new_rows):
+        return df
+
     ws = get_worksheet(sheet_name)
-    ws.clear()
-    if df.empty:
-        ws.update("A1", [list(df.columns)])
-    else:
-        data = [list(df.columns)] + df.astype(str).values.tolist()
-        ws.update("A1", data)
-    # キャッシュクリア
-    load_sheet_df.clear()
+    body = [list(df.columns)] + new_rows
+    # clear() で全消し→書き直しではなく、書き込むサイズへ resize してから
+    # 範囲更新する（縮んだ分の古い行はサイズ変更で落ちる）
+    _retry_api(ws.resize, rows=len(body), cols=len(body[0]))
+    _retry_api(ws.update, range_name="A1", values=body, value_input_option="RAW")
+    return df
+
+
+def write_sheet_df(sheet_name: str, df: pd.DataFrame):
+    df = _upload_sheet_df(sheet_name, df)
+    # 書き込んだ内容をそのままローカルキャッシュへ反映（再取得を省く）
+    _finish_sheet_write(sheet_name, df)
+
+
+def _write_changed_rows_only(sheet_name: str, new_rows: list) -> bool:
+    """変更行だけの batchUpdate を試みる。送信した（または送信不要だった）場合 True。"""
+    try:
+        base = _ensure_columns(load_sheet_df(sheet_name), sheet_name)
+        old_rows = _df_to_rows(base)
+    except Exception:
+        return False
+    if len(old_rows) != len(new_rows):
+        return False
+    changed = [i for i, (o, n) in enumerate(zip(old_rows, new_rows)) if o != n]
+    if not changed:
+        # 内容が同一なら API 呼び出し自体を省く
+        return True
+    # 差分が大きいときは1回の全体書き込みの方が安い
+    if len(changed) > max(1, len(new_rows) // 4):
+        return False
+    try:
+        _retry_api(
+            get_spreadsheet().values_batch_update,
+            {
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": f"{sheet_name}!A{i + 2}", "values": [new_rows[i]]}
+                    for i in changed
+                ],
+            }
+        )
+        return True
+    except Exception:
+        return False
+
+
+def append_sheet_rows(sheet_name: str, rows: list[dict]):
+    """行の追加だけならシート全体を書き直さず append_rows で1回のAPI呼び出しにする"""
+    if not rows:
+        return
+    cols = SHEET_SCHEMAS[sheet_name]
+    # 書き込み前のフレームを押さえておき、成功後にローカル反映する
+    try:
+        base = load_sheet_df(sheet_name)
+    except Exception:
+        base = None
+    ws = get_worksheet(sheet_name)
+    _retry_api(
+        ws.append_rows,
+        [[str(row.get(c, "")) for c in cols] for row in rows],
+        value_input_option="RAW",
+    )
+    updated = None
+    if base is not None:
+        try:
+            updated = pd.concat(
+                [base, pd.DataFrame(rows, columns=cols)], ignore_index=True
+            )
+        except Exception:
+            updated = None
+    _finish_sheet_write(sheet_name, updated)
+
+
+def update_sheet_row(sheet_name: str, row_index: int, row_dict: dict):
+    """既存の1行だけを範囲指定で更新する（clear + 全行再送をしない）。
+
+    row_index は DataFrame 上の 0 始まりの行位置（シート上では
+    ヘッダーの次、row_index + 2 行目）。row_dict に無い列は空文字に
+    なるため、行の全列を渡すこと。
+    """
+    cols = SHEET_SCHEMAS[sheet_name]
+    row = []
+    for c in cols:
+        v = row_dict.get(c, "")
+        row.append("" if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+    # 書き込み前のフレームを押さえておき、成功後にローカル反映する
+    try:
+        base = load_sheet_df(sheet_name)
+    except Exception:
+        base = None
+    ws = get_worksheet(sheet_name)
+    _retry_api(
+        ws.update,
+        range_name=f"A{row_index + 2}",
+        values=[row],
+        value_input_option="RAW",
+    )
+    updated = None
+    if base is not None:
+        try:
+            updated = base
+            # 列ごとの .at ではなく1回の行代入で済ませる
+            updated.loc[row_index, cols] = row
+        except Exception:
+            updated = None
+    _finish_sheet_write(sheet_name, updated)
+
+
+def delete_sheet_row(sheet_name: str, row_index: int):
+    """既存の1行だけをシートから削除する（clear + 全行再送をしない）。
+
+    row_index は DataFrame 上の 0 始まりの行位置。
+    """
+    # 書き込み前のフレームを押さえておき、成功後にローカル反映する
+    try:
+        base = load_sheet_df(sheet_name)
+    except Exception:
+        base = None
+    ws = get_worksheet(sheet_name)
+    _retry_api(ws.delete_rows, row_index + 2)
+    updated = None
+    if base is not None:
+        try:
+            updated = base.drop(index=row_index).reset_index(drop=True)
+        except Exception:
+            updated = None
+    _finish_sheet_write(sheet_name, updated)
 
 
 # ================
 # 認証・ユーザー管理
 # ================
 
+MASTER_USERNAME = "master"
+MASTER_NAME = "管理者"
+MASTER_PASSWORD = "Ubase2025"
+
+
+def _hash_master_password() -> str:
+    """初期 master パスワードのハッシュを生成する。
+
+    ブートストラップ専用なので bcrypt のコストを rounds=10 に下げて
+    初回起動のブロック時間を抑える（通常ユーザーのハッシュは
+    stauth.Hasher のライブラリ既定コストのまま）。
+    """
+    return bcrypt.hashpw(MASTER_PASSWORD.encode(), bcrypt.gensalt(rounds=10)).decode()
+
+
 def ensure_master_user():
     """
     users シートに master ユーザーが存在しなければ作成する。
@@ -287,46 +811,86 @@ def ensure_master_user():
     """
     df = load_sheet_df("users")
 
-    MASTER_USERNAME = "master"
-    MASTER_NAME = "管理者"
-    MASTER_PASSWORD = "Ubase2025"
-
-    # 空 or username 列が無い場合 → master だけ作って初期化
+    # 空 or username 列が無い場合 → master だけ追加
+    # （ヘッダー行は init_sheets が作成済みなので行追加だけでよい）
     if "username" not in df.columns or df.empty:
-        hashed = stauth.Hasher.hash(MASTER_PASSWORD)
-        df = pd.DataFrame(
+        hashed = _hash_master_password()
+        append_sheet_rows(
+            "users",
             [{
                 "username": MASTER_USERNAME,
                 "name": MASTER_NAME,
                 "password_hash": hashed,
                 "role": "master",
-            }]
+            }],
         )
-        write_sheet_df("users", df)
         return
 
     # 既に users シートがあって、master がいない場合だけ追加
     if not (df["username"] == MASTER_USERNAME).any():
-        hashed = stauth.Hasher.hash(MASTER_PASSWORD)
+        hashed = _hash_master_password()
         new_row = {
             "username": MASTER_USERNAME,
             "name": MASTER_NAME,
             "password_hash": hashed,
             "role": "master",
         }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        write_sheet_df("users", df)
+        # 1行追加するだけなのでシート全体の書き直しはしない
+        append_sheet_rows("users", [new_row])
+
+
+@st.cache_resource(ttl=600)
+def get_master_password_hash():
+    """master の password_hash を返す（存在しなければ None）。
+
+    生徒削除のたびに users シートを読み直さないよう cache_resource に載せる。
+    master のパスワードを変更した場合は clear() すること。
+    """
+    df = load_sheet_df("users")
+    if "username" not in df.columns:
+        return None
+    row = df.loc[df["username"] == MASTER_USERNAME]
+    if row.empty:
+        return None
+    return row.iloc[0]["password_hash"].encode()
+
+
+@st.cache_resource
+def _master_user_ensured() -> bool:
+    """master ユーザーの存在確認・作成をプロセス内で一度だけ実行する。
+
+    bcrypt ハッシュ生成は書き込みが必要な分岐の中でのみ行われるため、
+    2回目以降の呼び出しはシート読み込みごと丸ごとスキップできる。
+    """
+    ensure_master_user()
+    return True
 
 
 def build_authenticator():
     """
     users シートから認証情報とロールを読み込み、streamlit-authenticator を構築。
+
+    Authenticate オブジェクトの構築は users シートのフィンガープリントを
+    キーにキャッシュし、再実行のたびに作り直さない。
     """
+    df = load_sheet_df("users")
+    fingerprint = hashlib.blake2b(
+        pd.util.hash_pandas_object(df, index=False).values.tobytes(),
+        digest_size=16,
+    ).hexdigest()
+    return _build_authenticator_cached(fingerprint)
+
+
+@st.cache_resource
+def _build_authenticator_cached(users_fingerprint: str):
     df = load_sheet_df("users")
     creds = {"usernames": {}}
     roles = {}
-    for _, row in df.iterrows():
-        username = str(row["username"])
+    # iterrows は1行ごとに Series を作るため、一括で dict 化してから組み立てる
+    # （username 重複時は従来どおり後の行を優先）
+    deduped = df.drop_duplicates(subset=["username"], keep="last")
+    users_by_name = deduped.set_index(deduped["username"].astype(str)).to_dict("index")
+    for username, row in users_by_name.items():
         if not username:
             continue
         creds["usernames"][username] = {
@@ -356,6 +920,13 @@ def get_current_user_role(roles_dict, username: str) -> str:
 # 生徒ID採番ユーティリティ
 # ====================
 
+def _collect_student_ids(df: pd.DataFrame | None) -> pd.Series:
+    """DataFrame の student_id 列を数値化して返す（無効値・空欄は除外）"""
+    if df is None or df.empty or "student_id" not in df.columns:
+        return pd.Series([], dtype="int64")
+    return pd.to_numeric(df["student_id"], errors="coerce").dropna().astype("int64")
+
+
 def generate_new_student_id(students_df: pd.DataFrame | None = None) -> int:
     """
     一度使われた student_id を二度と再利用しないようにするため、
@@ -363,62 +934,25 @@ def generate_new_student_id(students_df: pd.DataFrame | None = None) -> int:
     の全ての student_id を見て最大値+1 を返す。
     """
 
-    all_ids: list[int] = []
-
-    # 1) students（関数からも呼ばれるので引数があれば優先）
+    # students は呼び出し元から渡されていれば優先
     if students_df is None:
         students_df = get_students_df()
-    if students_df is not None and not students_df.empty and "student_id" in students_df.columns:
-        for v in students_df["student_id"].astype(str):
-            v = v.strip()
-            if not v:
-                continue
-            try:
-                all_ids.append(int(v))
-            except Exception:
-                pass
-
-    # 2) exam_results
-    exam_df = get_exam_results_df()
-    if exam_df is not None and not exam_df.empty and "student_id" in exam_df.columns:
-        for v in exam_df["student_id"].astype(str):
-            v = v.strip()
-            if not v:
-                continue
-            try:
-                all_ids.append(int(v))
-            except Exception:
-                pass
-
-    # 3) coaching_reports
-    coaching_df = get_coaching_df()
-    if coaching_df is not None and not coaching_df.empty and "student_id" in coaching_df.columns:
-        for v in coaching_df["student_id"].astype(str):
-            v = v.strip()
-            if not v:
-                continue
-            try:
-                all_ids.append(int(v))
-            except Exception:
-                pass
 
-    # 4) eiken_records
-    eiken_df = get_eiken_df()
-    if eiken_df is not None and not eiken_df.empty and "student_id" in eiken_df.columns:
-        for v in eiken_df["student_id"].astype(str):
-            v = v.strip()
-            if not v:
-                continue
-            try:
-                all_ids.append(int(v))
-            except Exception:
-                pass
+    all_ids = pd.concat(
+        [
+            _collect_student_ids(students_df),
+            _collect_student_ids(get_exam_results_df()),
+            _collect_student_ids(get_coaching_df()),
+            _collect_student_ids(get_eiken_df()),
+        ],
+        ignore_index=True,
+    )
 
     # 何もなければ初期値からスタート（好きな番号でOK）
-    if not all_ids:
+    if all_ids.empty:
         return 250001  # 例：最初のID
 
-    return max(all_ids) + 1
+    return int(all_ids.max()) + 1
 
 
 # =========================
@@ -485,6 +1019,8 @@ REGULAR_EXAM_NAMES = [
 ]
 
 EIKEN_GRADES = ["5級", "4級", "3級", "準2級", "2級", "準1級", "1級"]
+# selectbox の初期位置用（毎回の list.index 線形走査を避ける）
+EIKEN_GRADE_INDEX = {g: i for i, g in enumerate(EIKEN_GRADES)}
 # 英検 各級ごとの問題数・満点（必要なら後で調整してください）
 EIKEN_TOTALS = {
     # reading / listening = 問題数
@@ -531,16 +1067,38 @@ def promote_grade_value(grade: str) -> str:
     return PROMOTION_MAP.get(grade, grade)
 
 
+def promote_grade_series(grades: pd.Series) -> pd.Series:
+    """学年の Series を一括で進級させる（行ごとの apply を使わない）。
+
+    マップに無い学年（既卒・高3 など）はそのまま残す。
+    """
+    grades = grades.astype(object)
+    return grades.map(PROMOTION_MAP).fillna(grades)
+
+
+# 値の種類が限られる列の category dtype 設定（load_sheet_df で適用）
+SHEET_CATEGORY_COLUMNS = {
+    "students": {"grade": GRADE_CHOICES},
+    "exam_results": {"exam_category": ["定期テスト", "模試"]},
+    "eiken_records": {"target_grade": EIKEN_GRADES},
+}
+
+
 # ==========
 # CSS / テーマ
 # ==========
 
-def inject_base_css():
-    css = """
+@st.cache_data
+def _base_css() -> str:
+    # CSS 文字列は固定なので一度だけ組み立ててキャッシュする。
+    # フォントは @import（レンダリングブロック）ではなく
+    # preconnect + link で非同期に読み込む。
+    return """
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;500;600;700;900&display=swap" rel="stylesheet">
     <style>
     /* Noto Sans JP を優先して使う（無ければシステムフォント） */
-    @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;500;600;700;900&display=swap');
-
     :root {
         --ubase-font-main: 'Noto Sans JP', -apple-system, BlinkMacSystemFont,
                            'Segoe UI', 'Yu Gothic UI', 'Meiryo', sans-serif;
@@ -669,9 +1227,11 @@ def inject_base_css():
     }
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
 
 
+def inject_base_css():
+    st.markdown(_base_css(), unsafe_allow_html=True)
+
 
 def inject_print_mode_css():
     css = """
@@ -691,20 +1251,63 @@ def inject_print_mode_css():
 # ページ共通ユーティリティ
 # ====================
 
+def _queue_flash(message: str):
+    """保存完了メッセージを次の rerun に持ち越して表示するよう積む。
+
+    成功表示のために sleep で描画を止めると、その分だけ rerun（＝画面反映）が
+    遅れるので、session_state 経由で次の実行に渡して st.toast で出す。
+    """
+    st.session_state["_flash"] = message
+
+
+def _option_labels(df, cols: list[str]) -> list[str]:
+    """selectbox 用の「先頭列 : 残り列...」ラベルを列演算で一括生成する"""
+    labels = df[cols[0]].astype("string").fillna("")
+    for i, c in enumerate(cols[1:]):
+        sep = " : " if i == 0 else " "
+        labels = labels + sep + df[c].astype("string").fillna("")
+    return labels.tolist()
+
+
+def _show_flash():
+    """_queue_flash で積まれたメッセージがあれば表示する"""
+    msg = st.session_state.pop("_flash", None)
+    if msg:
+        st.toast(msg)
+
+
+# 各ページの getter は load_all_tables 経由にまとめ、
+# 1回の再実行につき Sheets への読み込みを最大1回（バッチ）で済ませる。
+# st.cache_data はヒットごとにコピーを返すので、呼び出し側で加工しても安全。
+
 def get_students_df():
-    return load_sheet_df("students")
+    return load_all_tables()["students"]
 
 
 def get_exam_results_df():
-    return load_sheet_df("exam_results")
+    return load_all_tables()["exam_results"]
 
 
 def get_coaching_df():
-    return load_sheet_df("coaching_reports")
+    return load_all_tables()["coaching_reports"]
 
 
 def get_eiken_df():
-    return load_sheet_df("eiken_records")
+    return load_all_tables()["eiken_records"]
+
+
+def get_student_rows(sheet_name: str, student_id) -> pd.DataFrame:
+    """指定生徒の行だけを事前グループ化済みインデックスから取り出す。
+
+    boolean マスクの全走査を避け、dict 参照 + 行位置指定で切り出す。
+    該当行が無ければ空の DataFrame（スキーマ付き）を返す。
+    """
+    tables = load_all_tables()
+    df = tables[sheet_name]
+    idx = tables.get(sheet_name + "_by_student", {}).get(str(student_id))
+    if idx is None:
+        return df.iloc[0:0].copy()
+    return df.loc[idx].copy()
 
 
 # -----------------
@@ -714,6 +1317,8 @@ def get_eiken_df():
 def page_student_management(current_role: str):
     st.header("生徒管理")
 
+    # このページでは先頭で1回だけ読み込み、以後は使い回す
+    # （student_id は load 側で文字列に正規化済み）
     students_df = get_students_df()
 
     # ----------------------
@@ -775,24 +1380,21 @@ def page_student_management(current_role: str):
                 "target_school": target_school,
                 "admission_goal": admission_goal,
                 "student_login_id": student_login_id,
-                "subjects": json.dumps(subjects, ensure_ascii=False),
-                "mock_subjects": json.dumps(mock_subjects, ensure_ascii=False),
+                "subjects": _dumps(subjects),
+                "mock_subjects": _dumps(mock_subjects),
                 "created_at": datetime.now().isoformat(),
             }
-            students_df = pd.concat([students_df, pd.DataFrame([new_row])], ignore_index=True)
+            # 1行の追加に全体の concat コピーを作らず、末尾に直接書き込む
+            students_df.loc[len(students_df)] = [
+                new_row.get(c, "") for c in students_df.columns
+            ]
             write_sheet_df("students", students_df)
-            st.success(f"生徒を登録しました。生徒ID: {new_id}")
-            time.sleep(1)
+            _queue_flash(f"生徒を登録しました。生徒ID: {new_id}")
             st.rerun()
 
     st.markdown("---")
     st.markdown("### 生徒一覧")
 
-    # 最新の生徒データを取得（再読み込み）
-    students_df = get_students_df()
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
     if students_df.empty:
         st.info("まだ生徒が登録されていません。")
     else:
@@ -810,14 +1412,8 @@ def page_student_management(current_role: str):
         ]
         display_cols = [c for c in display_cols if c in students_df.columns]
 
-        df_disp = students_df[display_cols].copy()
-
-        # JSON カラムは見やすいように文字列化（そのまま表示）
-        for col in ["subjects", "mock_subjects"]:
-            if col in df_disp.columns:
-                df_disp[col] = df_disp[col].fillna("").astype(str)
-
-        # カラム名を日本語に変更
+        # 表示専用なので copy や JSON 列の文字列化は行わない
+        # （st.dataframe は NaN を空欄で表示する）
         rename_map = {
             "student_id": "生徒ID",
             "name": "生徒名",
@@ -829,7 +1425,7 @@ def page_student_management(current_role: str):
             "subjects": "定期テスト科目",
             "mock_subjects": "模試科目",
         }
-        df_disp = df_disp.rename(columns=rename_map)
+        df_disp = students_df.reindex(columns=display_cols).rename(columns=rename_map)
 
         st.dataframe(df_disp, use_container_width=True)
 
@@ -839,13 +1435,11 @@ def page_student_management(current_role: str):
     st.markdown("---")
     st.subheader("登録済み生徒一覧（簡易表示）")
 
-    students_df = get_students_df()
     if students_df.empty:
         st.info("生徒が登録されていません。")
         return
 
-    display_df = students_df[["student_id", "name", "grade", "school_name", "target_school"]].copy()
-    display_df = display_df.rename(
+    display_df = students_df[["student_id", "name", "grade", "school_name", "target_school"]].rename(
         columns={
             "student_id": "生徒ID",
             "name": "氏名",
@@ -862,13 +1456,7 @@ def page_student_management(current_role: str):
     st.markdown("---")
     st.subheader("生徒情報の編集（同じIDで学年・目標を更新）")
 
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
-    edit_options = [
-        f'{row["student_id"]} : {row["name"]}'
-        for _, row in students_df.iterrows()
-    ]
+    edit_options = _option_labels(students_df, ["student_id", "name"])
 
     if not edit_options:
         st.info("編集可能な生徒がいません。")
@@ -880,7 +1468,9 @@ def page_student_management(current_role: str):
         key="edit_student_select",
     )
     selected_id = selected_label.split(" : ")[0]
-    target_row = students_df[students_df["student_id"] == selected_id].iloc[0]
+    # student_id をインデックスにしたビューで参照（boolean マスクの全走査を回避）
+    students_by_id = students_df.set_index("student_id", drop=False)
+    target_row = students_by_id.loc[selected_id]
 
     col1, col2 = st.columns(2)
 
@@ -948,20 +1538,23 @@ def page_student_management(current_role: str):
 
     # ---------------- 保存処理 ----------------
     if st.button("生徒情報を更新", key="update_student"):
-        idx = students_df[students_df["student_id"] == selected_id].index[0]
-
-        # 同じ student_id のまま、各情報を上書き
-        students_df.at[idx, "name"] = edit_name
-        students_df.at[idx, "grade"] = edit_grade
-        students_df.at[idx, "school_name"] = edit_school_name
-        students_df.at[idx, "target_school"] = edit_target_school
-        students_df.at[idx, "admission_goal"] = edit_admission_goal
-        students_df.at[idx, "student_login_id"] = edit_student_login_id
-
-        write_sheet_df("students", students_df)
+        row_pos = students_by_id.index.get_loc(selected_id)
+
+        # 同じ student_id のまま、1行だけ範囲更新する（全行の再送をしない）
+        updated_row = target_row.to_dict()
+        updated_row.update(
+            {
+                "name": edit_name,
+                "grade": edit_grade,
+                "school_name": edit_school_name,
+                "target_school": edit_target_school,
+                "admission_goal": edit_admission_goal,
+                "student_login_id": edit_student_login_id,
+            }
+        )
+        update_sheet_row("students", row_pos, updated_row)
 
-        st.success("生徒情報を更新しました。（ID はそのまま、学年・目標のみ変更）")
-        time.sleep(0.5)
+        _queue_flash("生徒情報を更新しました。（ID はそのまま、学年・目標のみ変更）")
         st.rerun()
 
     # ----------------------
@@ -987,7 +1580,7 @@ def page_student_management(current_role: str):
             if not target_grades:
                 st.error("進級対象の学年を1つ以上選択してください。")
             else:
-                students_df_all = get_students_df().copy()
+                students_df_all = students_df.copy()
                 if students_df_all.empty or "grade" not in students_df_all.columns:
                     st.error("生徒データが存在しないか、grade列がありません。")
                 else:
@@ -997,19 +1590,14 @@ def page_student_management(current_role: str):
                     if n_targets == 0:
                         st.warning("選択された学年の生徒が見つかりませんでした。")
                     else:
-                        students_df_all.loc[mask, "grade"] = students_df_all.loc[mask, "grade"].apply(
-                            promote_grade_value
+                        students_df_all.loc[mask, "grade"] = promote_grade_series(
+                            students_df_all.loc[mask, "grade"]
                         )
 
                         write_sheet_df("students", students_df_all)
 
-                        try:
-                            load_sheet_df.clear()
-                        except Exception:
-                            pass
 
-                        st.success(f"{n_targets} 名の生徒の学年を進級させました。")
-                        time.sleep(0.5)
+                        _queue_flash(f"{n_targets} 名の生徒の学年を進級させました。")
                         st.rerun()
 
     # ----------------------
@@ -1020,9 +1608,7 @@ def page_student_management(current_role: str):
         st.subheader("生徒削除（master専用）")
 
         with st.expander("生徒の削除（紐づく成績・日報・英検も削除されます）"):
-            delete_labels = [
-                f'{row["student_id"]} : {row["name"]}' for _, row in students_df.iterrows()
-            ]
+            delete_labels = _option_labels(students_df, ["student_id", "name"])
             to_delete = st.multiselect("削除対象の生徒を選択", delete_labels)
             admin_password = st.text_input("管理者パスワードを入力", type="password")
 
@@ -1032,41 +1618,72 @@ def page_student_management(current_role: str):
                 elif not admin_password:
                     st.error("管理者パスワードを入力してください。")
                 else:
-                    users_df = load_sheet_df("users")
-                    master_row = users_df[users_df["username"] == "master"]
-                    if master_row.empty:
+                    hashed_pw = get_master_password_hash()
+                    if hashed_pw is None:
                         st.error("master ユーザーが見つかりません。")
                     else:
-                        hashed_pw = master_row.iloc[0]["password_hash"].encode()
                         if not bcrypt.checkpw(admin_password.encode(), hashed_pw):
                             st.error("管理者パスワードが正しくありません。")
                         else:
-                            delete_ids = [label.split(" : ")[0] for label in to_delete]
-
-                            # students
-                            students_df_new = students_df[~students_df["student_id"].isin(delete_ids)]
-                            write_sheet_df("students", students_df_new)
-
-                            # exam_results
-                            exam_df = get_exam_results_df()
-                            if not exam_df.empty:
-                                exam_df = exam_df[~exam_df["student_id"].astype(str).isin(delete_ids)]
-                                write_sheet_df("exam_results", exam_df)
-
-                            # coaching_reports
-                            coach_df = get_coaching_df()
-                            if not coach_df.empty:
-                                coach_df = coach_df[~coach_df["student_id"].astype(str).isin(delete_ids)]
-                                write_sheet_df("coaching_reports", coach_df)
-
-                            # eiken_records
-                            eiken_df = get_eiken_df()
-                            if not eiken_df.empty:
-                                eiken_df = eiken_df[~eiken_df["student_id"].astype(str).isin(delete_ids)]
-                                write_sheet_df("eiken_records", eiken_df)
-
-                            st.success("選択した生徒と紐づくデータを削除しました。")
-                            time.sleep(1)
+                            # student_id は load 側で文字列正規化済みなので astype は不要
+                            del_set = frozenset(
+                                label.split(" : ")[0] for label in to_delete
+                            )
+
+                            pending = [
+                                (
+                                    "students",
+                                    students_df[
+                                        ~students_df["student_id"].isin(del_set)
+                                    ],
+                                )
+                            ]
+                            for sheet_name, df in (
+                                ("exam_results", get_exam_results_df()),
+                                ("coaching_reports", get_coaching_df()),
+                                ("eiken_records", get_eiken_df()),
+                            ):
+                                if not df.empty:
+                                    pending.append(
+                                        (
+                                            sheet_name,
+                                            df[~df["student_id"].isin(del_set)],
+                                        )
+                                    )
+
+                            # Sheets への書き込みは I/O 待ちが支配的なので並列に
+                            # 投げる。ワーカーは cache_data 関数を呼ぶため、先読み
+                            # スレッド同様に ScriptRunContext を付与する。
+                            try:
+                                from streamlit.runtime.scriptrunner import (
+                                    add_script_run_ctx,
+                                    get_script_run_ctx,
+                                )
+
+                                ctx = get_script_run_ctx()
+                            except Exception:
+                                add_script_run_ctx = ctx = None
+
+                            def _attach_ctx():
+                                if add_script_run_ctx is not None:
+                                    add_script_run_ctx(
+                                        threading.current_thread(), ctx
+                                    )
+
+                            with ThreadPoolExecutor(
+                                max_workers=4, initializer=_attach_ctx
+                            ) as pool:
+                                futures = [
+                                    pool.submit(_upload_sheet_df, sheet_name, df)
+                                    for sheet_name, df in pending
+                                ]
+                                results = [f.result() for f in futures]
+                            # キャッシュ後始末（modifiedTime 再取得と世代キーの
+                            # 揃え直し）は競合しないよう本スレッドで直列に行う
+                            for (sheet_name, _), written in zip(pending, results):
+                                _finish_sheet_write(sheet_name, written)
+
+                            _queue_flash("選択した生徒と紐づくデータを削除しました。")
                             st.rerun()
 
 
@@ -1074,6 +1691,80 @@ def page_student_management(current_role: str):
 # 成績入力・分析ページ
 # -----------------
 
+@st.fragment
+def _render_grade_charts(student_id: str):
+    """成績推移グラフ（合計点・科目別）を fragment 境界の中で描画する。
+
+    fragment 内の再実行ではページ全体を巻き込まず、このグラフ構築
+    （Plotly の trace 生成と JSON 化）だけをやり直す。
+    """
+    exam_df = get_student_rows("exam_results", student_id)
+    if exam_df.empty:
+        return
+
+    # 日付でソート
+    if "date" in exam_df.columns:
+        exam_df = exam_df.assign(
+            date_dt=pd.to_datetime(exam_df["date"], errors="coerce")
+        ).sort_values(["date_dt", "exam_category", "exam_name"])
+
+    # 合計点の推移 & 科目別推移
+    # load 側で展開済みの results.<科目>.score / .target 列を列単位で集計する
+    labels = exam_df["date"].astype(str) + " " + exam_df["exam_name"].astype(str)
+    dates = labels.tolist()
+
+    score_cols = [
+        c for c in exam_df.columns if c.startswith("results.") and c.endswith(".score")
+    ]
+    target_cols = [
+        c for c in exam_df.columns if c.startswith("results.") and c.endswith(".target")
+    ]
+    if score_cols:
+        total_scores = exam_df[score_cols].fillna(0).sum(axis=1).tolist()
+    else:
+        total_scores = [0] * len(exam_df)
+    if target_cols:
+        total_targets = exam_df[target_cols].fillna(0).sum(axis=1).tolist()
+    else:
+        total_targets = [0] * len(exam_df)
+
+    # 科目 -> (x, y)。受験していない回（NaN）は元実装同様プロットしない
+    subject_scores_dict = {}
+    for col in score_cols:
+        subj = col[len("results.") : -len(".score")]
+        scores = exam_df[col]
+        mask = scores.notna()
+        if mask.any():
+            subject_scores_dict[subj] = {
+                "x": labels[mask].tolist(),
+                "y": scores[mask].tolist(),
+            }
+
+    st.markdown("##### 合計点の推移（全年度）")
+    fig_total = go.Figure()
+    fig_total.add_trace(go.Scatter(x=dates, y=total_scores, mode="lines+markers", name="合計点"))
+    fig_total.add_trace(
+        go.Scatter(
+            x=dates,
+            y=total_targets,
+            mode="lines+markers",
+            name="目標合計",
+            line=dict(dash="dash"),
+        )
+    )
+    fig_total.update_layout(xaxis_title="テスト", yaxis_title="得点", legend_title="項目")
+    st.plotly_chart(fig_total, use_container_width=True)
+
+    st.markdown("##### 科目別の推移")
+    fig_subj = go.Figure()
+    for subj, data in subject_scores_dict.items():
+        fig_subj.add_trace(
+            go.Scatter(x=data["x"], y=data["y"], mode="lines+markers", name=subj)
+        )
+    fig_subj.update_layout(xaxis_title="テスト", yaxis_title="得点", legend_title="科目")
+    st.plotly_chart(fig_subj, use_container_width=True)
+
+
 def page_grade_tracker():
     st.header("成績入力・分析")
 
@@ -1086,42 +1777,41 @@ def page_grade_tracker():
         st.info("生徒が登録されていません。先に「生徒管理」で登録してください。")
         return
 
-    # student_id を文字列にそろえる
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
     # 生徒選択
     student_label = st.selectbox(
         "生徒を選択",
-        [f'{row["student_id"]} : {row["name"]}' for _, row in students_df.iterrows()],
+        _option_labels(students_df, ["student_id", "name"]),
     )
     student_id = student_label.split(" : ")[0]
 
-    # 生徒行を特定
+    # 生徒行を特定（student_id インデックスのハッシュ参照）
     sid = str(student_id)
-    filtered = students_df[students_df["student_id"] == sid]
-    if filtered.empty:
+    students_by_id = students_df.set_index("student_id", drop=False)
+    if sid not in students_by_id.index:
         st.warning("選択された生徒データが見つかりません。画面を再読み込みしてから再度お試しください。")
         st.stop()
-    student_row = filtered.iloc[0]
+    student_row = students_by_id.loc[sid]
 
     # 区分
     exam_category = st.radio("テスト区分", ["定期テスト", "模試"], horizontal=True)
 
     if exam_category == "定期テスト":
         exam_name = st.selectbox("定期テスト名", REGULAR_EXAM_NAMES)
-        # 科目リストは subjects
-        try:
-            subjects = json.loads(student_row.get("subjects") or "[]")
-        except Exception:
-            subjects = []
+        subjects_col = "subjects"  # 科目リストは subjects
     else:
         exam_name = st.text_input("模試名（自由入力）")
-        # 科目リストは mock_subjects
-        try:
-            subjects = json.loads(student_row.get("mock_subjects") or "[]")
-        except Exception:
-            subjects = []
+        subjects_col = "mock_subjects"  # 科目リストは mock_subjects
+
+    # 科目リストの JSON は生徒・区分が変わったときだけパースし直す
+    raw_subjects = student_row.get(subjects_col) or "[]"
+    subjects_key = (sid, subjects_col, raw_subjects)
+    if st.session_state.get("_grade_subjects_key") != subjects_key:
+        parsed_subjects = _parse_json_cell(raw_subjects)
+        st.session_state["_grade_subjects"] = (
+            parsed_subjects if isinstance(parsed_subjects, list) else []
+        )
+        st.session_state["_grade_subjects_key"] = subjects_key
+    subjects = st.session_state["_grade_subjects"]
 
     exam_date = st.date_input("実施日", value=date.today())
 
@@ -1131,75 +1821,41 @@ def page_grade_tracker():
 
     # ----------------- 成績入力 -----------------
     st.markdown("#### 科目別の目標点・結果点")
-    results = {}
-    for subj in subjects:
-        col1, col2 = st.columns(2)
-        with col1:
-            target = st.number_input(
-                f"{subj} の目標点",
-                min_value=0,
-                max_value=1000,
-                value=80,
-                key=f"grade_target_{sid}_{subj}",
-            )
-        with col2:
-            score = st.number_input(
-                f"{subj} の結果点",
-                min_value=0,
-                max_value=1000,
-                value=0,
-                key=f"grade_score_{sid}_{subj}",
-            )
-        results[subj] = {"target": target, "score": score}
+    # number_input は1キー入力ごとに全体再実行を起こすため、form で登録ボタンまでまとめる
+    with st.form("grade_entry_form"):
+        results = {}
+        for subj in subjects:
+            col1, col2 = st.columns(2)
+            with col1:
+                target = st.number_input(
+                    f"{subj} の目標点",
+                    min_value=0,
+                    max_value=1000,
+                    value=80,
+                    key=f"grade_target_{sid}_{subj}",
+                )
+            with col2:
+                score = st.number_input(
+                    f"{subj} の結果点",
+                    min_value=0,
+                    max_value=1000,
+                    value=0,
+                    key=f"grade_score_{sid}_{subj}",
+                )
+            results[subj] = {"target": target, "score": score}
+
+        save_exam_clicked = st.form_submit_button("成績を登録")
 
-    if st.button("成績を登録", key="grade_save_exam"):
+    if save_exam_clicked:
         if exam_category == "模試" and not exam_name:
             st.error("模試名を入力してください。")
         else:
+            # スキーマ（空シート含む）は load 側で保証済み
             exam_df = get_exam_results_df()
 
-            # 空シート対策 & カラムそろえ
-            if exam_df.empty:
-                exam_df = pd.DataFrame(
-                    columns=[
-                        "id",
-                        "student_id",
-                        "exam_category",
-                        "exam_name",
-                        "date",
-                        "results_json",
-                        "created_at",
-                        "teacher_username",
-                        "teacher_name",
-                    ]
-                )
-            else:
-                # 足りないカラムがあれば追加
-                for col in [
-                    "id",
-                    "student_id",
-                    "exam_category",
-                    "exam_name",
-                    "date",
-                    "results_json",
-                    "created_at",
-                    "teacher_username",
-                    "teacher_name",
-                ]:
-                    if col not in exam_df.columns:
-                        exam_df[col] = ""
-
-            # ID 採番
-            if exam_df["id"].astype(str).str.strip().eq("").all():
-                new_id = 1
-            else:
-                ids = []
-                for v in exam_df["id"]:
-                    try:
-                        ids.append(int(v))
-                    except Exception:
-                        pass
-                new_id = (max(ids) + 1) if ids else 1
+            # ID 採番（数値化できる id の最大値 + 1。空・不正値は coerce で除外）
+            max_id = pd.to_numeric(exam_df["id"], errors="coerce").max()
+            new_id = 1 if pd.isna(max_id) else int(max_id) + 1
 
             new_row = {
                 "id": str(new_id),
@@ -1207,41 +1863,25 @@ def page_grade_tracker():
                 "exam_category": exam_category,
                 "exam_name": exam_name,
                 "date": exam_date.isoformat(),
-                "results_json": json.dumps(results, ensure_ascii=False),
+                "results_json": _dumps(results),
                 "created_at": datetime.now().isoformat(),
                 "teacher_username": teacher_username,
                 "teacher_name": teacher_name,
             }
-            exam_df = pd.concat([exam_df, pd.DataFrame([new_row])], ignore_index=True)
+            # 1行の追加に全体の concat コピーを作らず、末尾に直接書き込む
+            exam_df.loc[len(exam_df)] = [new_row.get(c, "") for c in exam_df.columns]
             write_sheet_df("exam_results", exam_df)
 
-            # キャッシュクリアして即反映
-            try:
-                load_sheet_df.clear()
-            except Exception:
-                pass
-            try:
-                load_all_tables.clear()
-            except Exception:
-                pass
 
-            st.success("成績を登録しました。")
-            time.sleep(0.5)
+            _queue_flash("成績を登録しました。")
             st.rerun()
 
     st.markdown("---")
     st.subheader("成績推移")
 
     # ----------------- 成績表示・グラフ -----------------
-    exam_df_all = get_exam_results_df()
-    if exam_df_all.empty:
-        st.info("この生徒の成績データはまだ登録されていません。")
-        return
-
-    # student_id を文字列でそろえてフィルタ
-    if "student_id" in exam_df_all.columns:
-        exam_df_all["student_id"] = exam_df_all["student_id"].astype(str)
-    exam_df = exam_df_all[exam_df_all["student_id"] == str(student_id)].copy()
+    # student_id は load 側で文字列に正規化済み。事前グループ化から取り出す
+    exam_df = get_student_rows("exam_results", student_id)
 
     if exam_df.empty:
         st.info("この生徒の成績データはまだ登録されていません。")
@@ -1254,60 +1894,8 @@ def page_grade_tracker():
     else:
         exam_df["date_dt"] = pd.NaT
 
-    # 合計点の推移 & 科目別推移
-    dates = []
-    total_scores = []
-    total_targets = []
-    subject_scores_dict = {}  # subj -> {"x": [], "y": []}
-
-    for _, row in exam_df.iterrows():
-        d = row.get("date", "")
-        label = f'{d} {row.get("exam_name", "")}'
-        dates.append(label)
-
-        try:
-            r = json.loads(row.get("results_json") or "{}")
-        except Exception:
-            r = {}
-        t_score = 0
-        t_target = 0
-        for subj, vals in r.items():
-            score = vals.get("score", 0)
-            target = vals.get("target", 0)
-            t_score += score
-            t_target += target
-
-            if subj not in subject_scores_dict:
-                subject_scores_dict[subj] = {"x": [], "y": []}
-            subject_scores_dict[subj]["x"].append(label)
-            subject_scores_dict[subj]["y"].append(score)
-
-        total_scores.append(t_score)
-        total_targets.append(t_target)
-
-    st.markdown("##### 合計点の推移（全年度）")
-    fig_total = go.Figure()
-    fig_total.add_trace(go.Scatter(x=dates, y=total_scores, mode="lines+markers", name="合計点"))
-    fig_total.add_trace(
-        go.Scatter(
-            x=dates,
-            y=total_targets,
-            mode="lines+markers",
-            name="目標合計",
-            line=dict(dash="dash"),
-        )
-    )
-    fig_total.update_layout(xaxis_title="テスト", yaxis_title="得点", legend_title="項目")
-    st.plotly_chart(fig_total, use_container_width=True)
-
-    st.markdown("##### 科目別の推移")
-    fig_subj = go.Figure()
-    for subj, data in subject_scores_dict.items():
-        fig_subj.add_trace(
-            go.Scatter(x=data["x"], y=data["y"], mode="lines+markers", name=subj)
-        )
-    fig_subj.update_layout(xaxis_title="テスト", yaxis_title="得点", legend_title="科目")
-    st.plotly_chart(fig_subj, use_container_width=True)
+    # グラフは fragment として独立に描画する
+    _render_grade_charts(str(student_id))
 
     # ----------------- 成績編集 -----------------
     st.markdown("---")
@@ -1316,11 +1904,7 @@ def page_grade_tracker():
     if "id" not in exam_df.columns:
         st.info("編集可能な成績データがありません。")
     else:
-        exam_df["id"] = exam_df["id"].astype(str)
-        edit_options = [
-            f'{row["id"]} : {row.get("date","")} {row.get("exam_category","")} {row.get("exam_name","")}'
-            for _, row in exam_df.iterrows()
-        ]
+        edit_options = _option_labels(exam_df, ["id", "date", "exam_category", "exam_name"])
 
         if not edit_options:
             st.info("編集可能な成績データがありません。")
@@ -1333,7 +1917,7 @@ def page_grade_tracker():
 
             if selected_edit:
                 edit_id = selected_edit.split(" : ")[0]
-                target_row = exam_df[exam_df["id"] == edit_id].iloc[0]
+                target_row = exam_df.set_index("id", drop=False).loc[edit_id]
 
                 st.markdown("#### 成績内容を編集")
 
@@ -1380,96 +1964,86 @@ def page_grade_tracker():
                     key=f"edit_exam_date_{edit_id}",
                 )
 
-                # 科目別の点数
-                try:
-                    res = json.loads(target_row.get("results_json") or "{}")
-                except Exception:
-                    res = {}
+                # 科目別の点数（load 側でパース済みの列を使う）
+                res = target_row.get("results_json_parsed") or {}
 
                 edit_results = {}
                 st.markdown("##### 科目別の目標点・結果点（編集）")
-                for subj, vals in res.items():
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        t_val = int(vals.get("target", 0) or 0)
-                        target_edit = st.number_input(
-                            f"{subj} の目標点（編集）",
-                            min_value=0,
-                            max_value=1000,
-                            value=t_val,
-                            key=f"edit_grade_target_{edit_id}_{subj}",
-                        )
-                    with col2:
-                        s_val = int(vals.get("score", 0) or 0)
-                        score_edit = st.number_input(
-                            f"{subj} の結果点（編集）",
-                            min_value=0,
-                            max_value=1000,
-                            value=s_val,
-                            key=f"edit_grade_score_{edit_id}_{subj}",
-                        )
-                    edit_results[subj] = {"target": target_edit, "score": score_edit}
+                # 登録フォームと同様、点数入力ごとの再実行を form でまとめる
+                with st.form(f"edit_form_{edit_id}"):
+                    for subj, vals in res.items():
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            t_val = int(vals.get("target", 0) or 0)
+                            target_edit = st.number_input(
+                                f"{subj} の目標点（編集）",
+                                min_value=0,
+                                max_value=1000,
+                                value=t_val,
+                                key=f"edit_grade_target_{edit_id}_{subj}",
+                            )
+                        with col2:
+                            s_val = int(vals.get("score", 0) or 0)
+                            score_edit = st.number_input(
+                                f"{subj} の結果点（編集）",
+                                min_value=0,
+                                max_value=1000,
+                                value=s_val,
+                                key=f"edit_grade_score_{edit_id}_{subj}",
+                            )
+                        edit_results[subj] = {"target": target_edit, "score": score_edit}
+
+                    update_exam_clicked = st.form_submit_button("この成績を更新")
 
-                if st.button("この成績を更新", key=f"btn_update_exam_{edit_id}"):
+                if update_exam_clicked:
                     exam_all = get_exam_results_df()
                     if exam_all.empty or "id" not in exam_all.columns:
                         st.error("成績データが見つかりませんでした。")
                     else:
-                        exam_all["id"] = exam_all["id"].astype(str)
-                        mask = exam_all["id"] == edit_id
-                        if not mask.any():
+                        row_pos = exam_all.attrs.get("id_index", {}).get(edit_id)
+                        if row_pos is None:
                             st.error("対象の成績データが見つかりませんでした。")
                         else:
-                            idx = exam_all[mask].index[0]
-                            exam_all.at[idx, "exam_category"] = edit_exam_category
-                            exam_all.at[idx, "exam_name"] = edit_exam_name
-                            exam_all.at[idx, "date"] = edit_exam_date.isoformat()
-                            exam_all.at[idx, "results_json"] = json.dumps(
-                                edit_results, ensure_ascii=False
+                            updated_row = exam_all.loc[row_pos].to_dict()
+                            updated_row.update(
+                                {
+                                    "exam_category": edit_exam_category,
+                                    "exam_name": edit_exam_name,
+                                    "date": edit_exam_date.isoformat(),
+                                    "results_json": _dumps(edit_results),
+                                    # 更新者を現在ログイン中の講師で上書き
+                                    "teacher_username": teacher_username,
+                                    "teacher_name": teacher_name,
+                                }
                             )
-                            # 更新者を現在ログイン中の講師で上書き
-                            exam_all.at[idx, "teacher_username"] = teacher_username
-                            exam_all.at[idx, "teacher_name"] = teacher_name
-
-                            write_sheet_df("exam_results", exam_all)
-                            try:
-                                load_sheet_df.clear()
-                            except Exception:
-                                pass
-                            try:
-                                load_all_tables.clear()
-                            except Exception:
-                                pass
+                            # 対象の1行だけ範囲更新（全行の再送をしない）
+                            update_sheet_row("exam_results", row_pos, updated_row)
 
-                            st.success("成績データを更新しました。")
-                            time.sleep(1)
+                            _queue_flash("成績データを更新しました。")
                             st.rerun()
 
     # ----------------- 成績一覧表（テストごと横向き） -----------------
     st.markdown("##### 成績一覧（テストごとの得点）")
 
-    # 1テスト (=1行) ずつ表示
-    for _, exam_row in exam_df.iterrows():
-        exam_label = f'{exam_row.get("date","")} {exam_row.get("exam_category","")} {exam_row.get("exam_name","")}'
+    # 1テスト (=1行) ずつ表示。results_json は load 側でパース済みの列を使い回す
+    exam_labels = (
+        exam_df["date"].astype(str)
+        + " "
+        + exam_df["exam_category"].astype(str)
+        + " "
+        + exam_df["exam_name"].astype(str)
+    )
+    for exam_label, res in zip(exam_labels, exam_df["results_json_parsed"]):
         st.markdown(f"**{exam_label}**")
 
-        try:
-            res = json.loads(exam_row.get("results_json") or "{}")
-        except Exception:
-            res = {}
-
         if not res:
             st.write("（科目データなし）")
             continue
 
-        subjects = []
-        scores = []
-        for subj, vals in res.items():
-            subjects.append(subj)
-            scores.append(vals.get("score", 0))
-
-        df_exam = pd.DataFrame([scores], columns=subjects)
-        df_exam.index = ["得点"]
+        df_exam = pd.DataFrame(
+            [{subj: vals.get("score", 0) for subj, vals in res.items()}],
+            index=["得点"],
+        )
         st.table(df_exam)
         st.markdown("")  # 余白
 
@@ -1477,10 +2051,7 @@ def page_grade_tracker():
     with st.expander("成績データの削除"):
         unique_exams = exam_df[["id", "date", "exam_name", "exam_category"]].drop_duplicates()
 
-        delete_options = [
-            f'{row["id"]} : {row["date"]} {row["exam_category"]} {row["exam_name"]}'
-            for _, row in unique_exams.iterrows()
-        ]
+        delete_options = _option_labels(unique_exams, ["id", "date", "exam_category", "exam_name"])
 
         selected_delete = st.selectbox(
             "削除するテストを選択",
@@ -1501,30 +2072,56 @@ def page_grade_tracker():
                 if exam_df_all2.empty or "id" not in exam_df_all2.columns:
                     st.error("成績データが見つかりませんでした。")
                 else:
-                    exam_df_all2["id"] = exam_df_all2["id"].astype(str)
                     exam_df_all2 = exam_df_all2[exam_df_all2["id"] != del_id]
                     write_sheet_df("exam_results", exam_df_all2)
 
-                    try:
-                        load_sheet_df.clear()
-                    except Exception:
-                        pass
-                    try:
-                        load_all_tables.clear()
-                    except Exception:
-                        pass
 
-                    st.success("成績データを削除しました。")
-                    time.sleep(1)
+                    _queue_flash("成績データを削除しました。")
                     st.rerun()
 
 
-
-
 # -----------------
 # 授業日報・コーチング
 # -----------------
 
+@dataclass(slots=True)
+class StudentEval:
+    """日報の生徒自己評価（student_eval_json の1レコード分）"""
+
+    understanding: int
+    goal: int
+    motivation: int
+
+    def to_json(self) -> str:
+        return _dumps(
+            {
+                "理解度": self.understanding,
+                "目標達成度": self.goal,
+                "モチベーション": self.motivation,
+            }
+        )
+
+
+@dataclass(slots=True)
+class TeacherEval:
+    """日報の講師評価（teacher_eval_json の1レコード分）"""
+
+    attitude: int
+    homework: int
+    prev_understanding: int
+    comment: str
+
+    def to_json(self) -> str:
+        return _dumps(
+            {
+                "授業態度": self.attitude,
+                "宿題完成度": self.homework,
+                "前回理解度": self.prev_understanding,
+                "コメント": self.comment,
+            }
+        )
+
+
 def page_coaching():
     st.header("授業日報・コーチング")
 
@@ -1546,14 +2143,10 @@ def page_coaching():
         st.info("生徒が登録されていません。")
         return
 
-    # student_id を文字列にそろえる
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
     # 生徒選択
     student_label = st.selectbox(
         "生徒を選択",
-        [f'{row["student_id"]} : {row["name"]}' for _, row in students_df.iterrows()],
+        _option_labels(students_df, ["student_id", "name"]),
     )
     student_id = student_label.split(" : ")[0]
     student_name = student_label.split(" : ")[1]
@@ -1563,13 +2156,8 @@ def page_coaching():
     report_date = st.date_input("日付", value=today)
     date_str = report_date.isoformat()
 
-    # この生徒の既存日報
-    coaching_df = get_coaching_df()
-    if not coaching_df.empty and "student_id" in coaching_df.columns:
-        coaching_df["student_id"] = coaching_df["student_id"].astype(str)
-        coaching_df_student = coaching_df[coaching_df["student_id"] == str(student_id)]
-    else:
-        coaching_df_student = pd.DataFrame()
+    # この生徒の既存日報（事前グループ化から取り出す）
+    coaching_df_student = get_student_rows("coaching_reports", student_id)
 
     # 前回の目標表示
     st.subheader("前回までの自習計画・目標（最新）")
@@ -1577,14 +2165,9 @@ def page_coaching():
         st.info("まだ日報が登録されていません。")
     else:
         latest_row = coaching_df_student.sort_values("date").iloc[-1]
-        try:
-            prev_schedule = json.loads(latest_row.get("study_schedule_json") or "{}")
-        except Exception:
-            prev_schedule = {}
-        try:
-            prev_targets = json.loads(latest_row.get("study_targets_json") or "[]")
-        except Exception:
-            prev_targets = []
+        # load 側でパース済みの列を使う（パース失敗・空欄は {} になっている）
+        prev_schedule = latest_row.get("study_schedule_json_parsed") or {}
+        prev_targets = latest_row.get("study_targets_json_parsed") or []
 
         st.markdown("**前回の自習予定（曜日と時間）**")
         if prev_schedule:
@@ -1604,186 +2187,118 @@ def page_coaching():
     st.markdown("---")
     st.subheader("今回の授業日報入力（新規・同日上書き）")
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown("**生徒自己評価 (1〜5)**")
-        stu_understanding = st.slider("授業理解度", 1, 5, 3)
-        stu_goal = st.slider("目標達成度", 1, 5, 3)
-        stu_motivation = st.slider("モチベーション", 1, 5, 3)
+    # スライダー・曜日選択のたびにページ全体を再実行しないようフラグメント化
+    @st.fragment
+    def _coaching_entry():
+        col1, col2 = st.columns(2)
 
-    with col2:
-        st.markdown("**講師評価 (1〜5)**")
-        tch_attitude = st.slider("授業態度", 1, 5, 3)
-        tch_homework = st.slider("宿題完成度", 1, 5, 3)
-        tch_prev_understand = st.slider("前回理解度", 1, 5, 3)
-
-    teacher_comment = st.text_area("講師コメント（100字目安）", height=80)
-
-    st.markdown("#### 次回までの自習予定（曜日と時間）")
-    selected_days = st.multiselect("勉強する曜日を選択", DAYS_JP)
-    schedule_dict = {}
-    for d in selected_days:
-        hrs = st.number_input(
-            f"{d}曜日の目標勉強時間（時間）",
-            min_value=0.0,
-            max_value=24.0,
-            value=1.0,
-            step=0.5,
-            key=f"hrs_{d}",
-        )
-        schedule_dict[d] = hrs
-
-    st.markdown("#### 次回までの自習目標（内容）")
-    target1 = st.text_input("目標1（例：英単語100個）")
-    target2 = st.text_input("目標2")
-    target3 = st.text_input("目標3")
-    targets_list = [target1, target2, target3]
-
-    # ------------- 保存処理（新規 or 同日上書き）-------------
-    if st.button("日報を保存", key="save_coaching"):
-        student_eval = {
-            "理解度": stu_understanding,
-            "目標達成度": stu_goal,
-            "モチベーション": stu_motivation,
-        }
-        teacher_eval = {
-            "授業態度": tch_attitude,
-            "宿題完成度": tch_homework,
-            "前回理解度": tch_prev_understand,
-            "コメント": teacher_comment,
-        }
+        with col1:
+            st.markdown("**生徒自己評価 (1〜5)**")
+            stu_understanding = st.slider("授業理解度", 1, 5, 3)
+            stu_goal = st.slider("目標達成度", 1, 5, 3)
+            stu_motivation = st.slider("モチベーション", 1, 5, 3)
 
-        coaching_df_all = get_coaching_df()
-        # 空シート対策
-        if coaching_df_all.empty:
-            coaching_df_all = pd.DataFrame(
-                columns=[
-                    "id",
-                    "student_id",
-                    "date",
-                    "student_eval_json",
-                    "teacher_eval_json",
-                    "study_schedule_json",
-                    "study_targets_json",
-                    "created_at",
-                    "updated_at",
-                    "teacher_username",
-                    "teacher_name",
-                ]
+        with col2:
+            st.markdown("**講師評価 (1〜5)**")
+            tch_attitude = st.slider("授業態度", 1, 5, 3)
+            tch_homework = st.slider("宿題完成度", 1, 5, 3)
+            tch_prev_understand = st.slider("前回理解度", 1, 5, 3)
+
+        teacher_comment = st.text_area("講師コメント（100字目安）", height=80)
+
+        st.markdown("#### 次回までの自習予定（曜日と時間）")
+        selected_days = st.multiselect("勉強する曜日を選択", DAYS_JP)
+        schedule_dict = {}
+        for d in selected_days:
+            hrs = st.number_input(
+                f"{d}曜日の目標勉強時間（時間）",
+                min_value=0.0,
+                max_value=24.0,
+                value=1.0,
+                step=0.5,
+                key=f"hrs_{d}",
+            )
+            schedule_dict[d] = hrs
+
+        st.markdown("#### 次回までの自習目標（内容）")
+        target1 = st.text_input("目標1（例：英単語100個）")
+        target2 = st.text_input("目標2")
+        target3 = st.text_input("目標3")
+        targets_list = [target1, target2, target3]
+
+        # ------------- 保存処理（新規 or 同日上書き）-------------
+        if st.button("日報を保存", key="save_coaching"):
+            student_eval = StudentEval(stu_understanding, stu_goal, stu_motivation)
+            teacher_eval = TeacherEval(
+                tch_attitude, tch_homework, tch_prev_understand, teacher_comment
             )
-        else:
-            # 足りないカラムを追加
-            for col in [
-                "id",
-                "student_id",
-                "date",
-                "student_eval_json",
-                "teacher_eval_json",
-                "study_schedule_json",
-                "study_targets_json",
-                "created_at",
-                "updated_at",
-                "teacher_username",
-                "teacher_name",
-            ]:
-                if col not in coaching_df_all.columns:
-                    coaching_df_all[col] = ""
-
-        # 型をそろえる
-        if "student_id" in coaching_df_all.columns:
-            coaching_df_all["student_id"] = coaching_df_all["student_id"].astype(str)
-
-        # 同一生徒・同一日付があるか確認
-        mask = (coaching_df_all["student_id"] == str(student_id)) & (
-            coaching_df_all["date"] == date_str
-        )
 
-        now_str = datetime.now().isoformat()
+            # スキーマ・文字列 id は load 側で保証済み
+            coaching_df_all = get_coaching_df()
 
-        if mask.any():
-            # UPDATE
-            idx = coaching_df_all[mask].index[0]
-            coaching_df_all.at[idx, "student_eval_json"] = json.dumps(student_eval, ensure_ascii=False)
-            coaching_df_all.at[idx, "teacher_eval_json"] = json.dumps(teacher_eval, ensure_ascii=False)
-            coaching_df_all.at[idx, "study_schedule_json"] = json.dumps(schedule_dict, ensure_ascii=False)
-            coaching_df_all.at[idx, "study_targets_json"] = json.dumps(targets_list, ensure_ascii=False)
-            coaching_df_all.at[idx, "updated_at"] = now_str
-            coaching_df_all.at[idx, "teacher_username"] = teacher_username
-            coaching_df_all.at[idx, "teacher_name"] = teacher_name_to_save
-            msg = "同日のデータが存在したため、上書き保存しました。"
-            show = st.warning
-        else:
-            # 新規 ID 採番
-            if "id" not in coaching_df_all.columns:
-                coaching_df_all["id"] = ""
+            # 同一生徒・同一日付があるか確認（load 側で添付した辞書を参照）
+            row_pos = coaching_df_all.attrs.get("sid_date_index", {}).get(
+                (str(student_id), date_str)
+            )
 
-            if coaching_df_all["id"].astype(str).str.strip().eq("").all():
-                new_id = 1
+            now_str = datetime.now().isoformat()
+
+            if row_pos is not None:
+                # UPDATE: 対象の1行だけ範囲更新（全行の再送をしない）
+                updated_row = coaching_df_all.loc[row_pos].to_dict()
+                updated_row.update(
+                    {
+                        "student_eval_json": student_eval.to_json(),
+                        "teacher_eval_json": teacher_eval.to_json(),
+                        "study_schedule_json": _dumps(schedule_dict),
+                        "study_targets_json": _dumps(targets_list),
+                        "updated_at": now_str,
+                        "teacher_username": teacher_username,
+                        "teacher_name": teacher_name_to_save,
+                    }
+                )
+                update_sheet_row("coaching_reports", row_pos, updated_row)
+                msg = "同日のデータが存在したため、上書き保存しました。"
             else:
-                ids = []
-                for v in coaching_df_all["id"]:
-                    try:
-                        ids.append(int(v))
-                    except Exception:
-                        pass
-                new_id = (max(ids) + 1) if ids else 1
-
-            new_row = {
-                "id": str(new_id),
-                "student_id": str(student_id),
-                "date": date_str,
-                "student_eval_json": json.dumps(student_eval, ensure_ascii=False),
-                "teacher_eval_json": json.dumps(teacher_eval, ensure_ascii=False),
-                "study_schedule_json": json.dumps(schedule_dict, ensure_ascii=False),
-                "study_targets_json": json.dumps(targets_list, ensure_ascii=False),
-                "created_at": now_str,
-                "updated_at": now_str,
-                "teacher_username": teacher_username,
-                "teacher_name": teacher_name_to_save,
-            }
-            coaching_df_all = pd.concat([coaching_df_all, pd.DataFrame([new_row])], ignore_index=True)
-            msg = "保存しました。"
-            show = st.success
+                # 新規 ID 採番（数値化できる id の最大値 + 1）
+                max_id = pd.to_numeric(coaching_df_all["id"], errors="coerce").max()
+                new_id = 1 if pd.isna(max_id) else int(max_id) + 1
+
+                new_row = {
+                    "id": str(new_id),
+                    "student_id": str(student_id),
+                    "date": date_str,
+                    "student_eval_json": student_eval.to_json(),
+                    "teacher_eval_json": teacher_eval.to_json(),
+                    "study_schedule_json": _dumps(schedule_dict),
+                    "study_targets_json": _dumps(targets_list),
+                    "created_at": now_str,
+                    "updated_at": now_str,
+                    "teacher_username": teacher_username,
+                    "teacher_name": teacher_name_to_save,
+                }
+                # 1行の追加は append だけで済ませる
+                append_sheet_rows("coaching_reports", [new_row])
+                msg = "保存しました。"
 
-        write_sheet_df("coaching_reports", coaching_df_all)
 
-        # キャッシュをクリアして即反映
-        try:
-            load_sheet_df.clear()
-        except Exception:
-            pass
-        try:
-            load_all_tables.clear()
-        except Exception:
-            pass
+            _queue_flash(msg)
+            st.rerun(scope="app")
 
-        show(msg)
-        time.sleep(0.5)
-        st.rerun()
+    _coaching_entry()
 
     # ------------- 編集機能（既存日報の編集）-------------
     st.markdown("---")
     st.subheader("登録済み日報の編集")
 
-    coaching_df = get_coaching_df()
-    if not coaching_df.empty and "student_id" in coaching_df.columns:
-        coaching_df["student_id"] = coaching_df["student_id"].astype(str)
-        coaching_df_student = coaching_df[coaching_df["student_id"] == str(student_id)].sort_values(
-            "date", ascending=False
-        )
-        if "id" in coaching_df_student.columns:
-            coaching_df_student = coaching_df_student.copy()
-            coaching_df_student["id"] = coaching_df_student["id"].astype(str)
-    else:
-        coaching_df_student = pd.DataFrame()
+    # ページ先頭で取得済みの生徒別データを使い回す
+    if not coaching_df_student.empty:
+        coaching_df_student = coaching_df_student.sort_values("date", ascending=False)
 
     if coaching_df_student.empty or "id" not in coaching_df_student.columns:
         st.info("編集可能な日報データがありません。")
     else:
-        edit_options = [
-            f'{row["id"]} : {row["date"]}' for _, row in coaching_df_student.iterrows()
-        ]
+        edit_options = _option_labels(coaching_df_student, ["id", "date"])
 
         selected_edit = st.selectbox(
             "編集する日報を選択",
@@ -1795,232 +2310,193 @@ def page_coaching():
             edit_id = selected_edit.split(" : ")[0]
             target_row = coaching_df_student[coaching_df_student["id"] == edit_id].iloc[0]
 
-            st.markdown("### 日報内容を編集")
+            # スライダー操作でページ全体を再実行しないようフラグメント化（更新時のみ全体更新）
+            @st.fragment
+            def _coaching_edit():
+                st.markdown("### 日報内容を編集")
+
+                # ここから下はこの if の中身なので、全部この深さでOK
+                existing_teacher_name = (target_row.get("teacher_name", "") or "").strip()
+                edit_teacher_name = st.text_input(
+                    "担当講師名（編集）",
+                    value=existing_teacher_name or (st.session_state.get("name", "") or ""),
+                    key=f"edit_teacher_name_{edit_id}",
+                )
+                edit_teacher_name_to_save = (
+                    (edit_teacher_name or "").strip()
+                    or (st.session_state.get("name", "") or "").strip()
+                )
 
-            # ここから下はこの if の中身なので、全部この深さでOK
-            existing_teacher_name = (target_row.get("teacher_name", "") or "").strip()
-            edit_teacher_name = st.text_input(
-                "担当講師名（編集）",
-                value=existing_teacher_name or (st.session_state.get("name", "") or ""),
-                key=f"edit_teacher_name_{edit_id}",
-            )
-            edit_teacher_name_to_save = (
-                (edit_teacher_name or "").strip()
-                or (st.session_state.get("name", "") or "").strip()
-            )
+                # 日付（編集）
+                try:
+                    edit_date_val = datetime.fromisoformat(target_row.get("date", "")).date()
+                except Exception:
+                    edit_date_val = date.today()
+                edit_report_date = st.date_input(
+                    "日付（編集）",
+                    value=edit_date_val,
+                    key=f"edit_report_date_{edit_id}",
+                )
 
-            # 日付（編集）
-            try:
-                edit_date_val = datetime.fromisoformat(target_row.get("date", "")).date()
-            except Exception:
-                edit_date_val = date.today()
-            edit_report_date = st.date_input(
-                "日付（編集）",
-                value=edit_date_val,
-                key=f"edit_report_date_{edit_id}",
-            )
+                # JSON → 辞書（load 側でパース済み）
+                se = target_row.get("student_eval_json_parsed") or {}
+                te = target_row.get("teacher_eval_json_parsed") or {}
+                schedule_old = target_row.get("study_schedule_json_parsed") or {}
+                targets_old = target_row.get("study_targets_json_parsed") or []
 
-            # JSON → 辞書
-            try:
-                se = json.loads(target_row.get("student_eval_json") or "{}")
-            except Exception:
-                se = {}
-            try:
-                te = json.loads(target_row.get("teacher_eval_json") or "{}")
-            except Exception:
-                te = {}
-            try:
-                schedule_old = json.loads(target_row.get("study_schedule_json") or "{}")
-            except Exception:
-                schedule_old = {}
-            try:
-                targets_old = json.loads(target_row.get("study_targets_json") or "[]")
-            except Exception:
-                targets_old = []
+                # 安全に int 変換
+                def _to_int(v, default=3):
+                    try:
+                        return int(v)
+                    except Exception:
+                        return default
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown("**生徒自己評価 (1〜5)（編集）**")
+                    edit_stu_understanding = st.slider(
+                        "授業理解度（編集）",
+                        1, 5,
+                        _to_int(se.get("理解度", 3)),
+                        key=f"edit_stu_understanding_{edit_id}",
+                    )
+                    edit_stu_goal = st.slider(
+                        "目標達成度（編集）",
+                        1, 5,
+                        _to_int(se.get("目標達成度", 3)),
+                        key=f"edit_stu_goal_{edit_id}",
+                    )
+                    edit_stu_motivation = st.slider(
+                        "モチベーション（編集）",
+                        1, 5,
+                        _to_int(se.get("モチベーション", 3)),
+                        key=f"edit_stu_motivation_{edit_id}",
+                    )
 
-            # 安全に int 変換
-            def _to_int(v, default=3):
-                try:
-                    return int(v)
-                except Exception:
-                    return default
+                with col2:
+                    st.markdown("**講師評価 (1〜5)（編集）**")
+                    edit_tch_attitude = st.slider(
+                        "授業態度（編集）",
+                        1, 5,
+                        _to_int(te.get("授業態度", 3)),
+                        key=f"edit_tch_attitude_{edit_id}",
+                    )
+                    edit_tch_homework = st.slider(
+                        "宿題完成度（編集）",
+                        1, 5,
+                        _to_int(te.get("宿題完成度", 3)),
+                        key=f"edit_tch_homework_{edit_id}",
+                    )
+                    edit_tch_prev_understand = st.slider(
+                        "前回理解度（編集）",
+                        1, 5,
+                        _to_int(te.get("前回理解度", 3)),
+                        key=f"edit_tch_prev_understand_{edit_id}",
+                    )
 
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("**生徒自己評価 (1〜5)（編集）**")
-                edit_stu_understanding = st.slider(
-                    "授業理解度（編集）",
-                    1, 5,
-                    _to_int(se.get("理解度", 3)),
-                    key=f"edit_stu_understanding_{edit_id}",
+                edit_teacher_comment = st.text_area(
+                    "講師コメント（編集）",
+                    value=te.get("コメント", ""),
+                    height=80,
+                    key=f"edit_teacher_comment_{edit_id}",
                 )
-                edit_stu_goal = st.slider(
-                    "目標達成度（編集）",
-                    1, 5,
-                    _to_int(se.get("目標達成度", 3)),
-                    key=f"edit_stu_goal_{edit_id}",
-                )
-                edit_stu_motivation = st.slider(
-                    "モチベーション（編集）",
-                    1, 5,
-                    _to_int(se.get("モチベーション", 3)),
-                    key=f"edit_stu_motivation_{edit_id}",
+
+                st.markdown("#### 次回までの自習予定（編集）")
+                # もともと時間が入っていた曜日を初期選択
+                default_days = [d for d in DAYS_JP if d in (schedule_old or {})]
+                edit_selected_days = st.multiselect(
+                    "勉強する曜日を選択（編集）",
+                    DAYS_JP,
+                    default=default_days,
+                    key=f"edit_days_{edit_id}",
                 )
+                edit_schedule_dict = {}
+                for d in edit_selected_days:
+                    default_hr = 1.0
+                    if schedule_old and d in schedule_old:
+                        try:
+                            default_hr = float(schedule_old[d])
+                        except Exception:
+                            default_hr = 1.0
+                    hrs = st.number_input(
+                        f"{d}曜日の目標勉強時間（時間）（編集）",
+                        min_value=0.0,
+                        max_value=24.0,
+                        value=default_hr,
+                        step=0.5,
+                        key=f"edit_hrs_{edit_id}_{d}",
+                    )
+                    edit_schedule_dict[d] = hrs
 
-            with col2:
-                st.markdown("**講師評価 (1〜5)（編集）**")
-                edit_tch_attitude = st.slider(
-                    "授業態度（編集）",
-                    1, 5,
-                    _to_int(te.get("授業態度", 3)),
-                    key=f"edit_tch_attitude_{edit_id}",
+                st.markdown("#### 次回までの自習目標（編集）")
+                t1_old = targets_old[0] if len(targets_old) > 0 else ""
+                t2_old = targets_old[1] if len(targets_old) > 1 else ""
+                t3_old = targets_old[2] if len(targets_old) > 2 else ""
+
+                edit_target1 = st.text_input(
+                    "目標1（編集）",
+                    value=t1_old,
+                    key=f"edit_target1_{edit_id}",
                 )
-                edit_tch_homework = st.slider(
-                    "宿題完成度（編集）",
-                    1, 5,
-                    _to_int(te.get("宿題完成度", 3)),
-                    key=f"edit_tch_homework_{edit_id}",
+                edit_target2 = st.text_input(
+                    "目標2（編集）",
+                    value=t2_old,
+                    key=f"edit_target2_{edit_id}",
                 )
-                edit_tch_prev_understand = st.slider(
-                    "前回理解度（編集）",
-                    1, 5,
-                    _to_int(te.get("前回理解度", 3)),
-                    key=f"edit_tch_prev_understand_{edit_id}",
+                edit_target3 = st.text_input(
+                    "目標3（編集）",
+                    value=t3_old,
+                    key=f"edit_target3_{edit_id}",
                 )
+                edit_targets_list = [edit_target1, edit_target2, edit_target3]
 
-            edit_teacher_comment = st.text_area(
-                "講師コメント（編集）",
-                value=te.get("コメント", ""),
-                height=80,
-                key=f"edit_teacher_comment_{edit_id}",
-            )
+                if st.button("この日報を更新", key=f"btn_update_coaching_{edit_id}"):
+                    new_student_eval = StudentEval(
+                        edit_stu_understanding, edit_stu_goal, edit_stu_motivation
+                    )
+                    new_teacher_eval = TeacherEval(
+                        edit_tch_attitude,
+                        edit_tch_homework,
+                        edit_tch_prev_understand,
+                        edit_teacher_comment,
+                    )
 
-            st.markdown("#### 次回までの自習予定（編集）")
-            # もともと時間が入っていた曜日を初期選択
-            default_days = [d for d in DAYS_JP if d in (schedule_old or {})]
-            edit_selected_days = st.multiselect(
-                "勉強する曜日を選択（編集）",
-                DAYS_JP,
-                default=default_days,
-                key=f"edit_days_{edit_id}",
-            )
-            edit_schedule_dict = {}
-            for d in edit_selected_days:
-                default_hr = 1.0
-                if schedule_old and d in schedule_old:
-                    try:
-                        default_hr = float(schedule_old[d])
-                    except Exception:
-                        default_hr = 1.0
-                hrs = st.number_input(
-                    f"{d}曜日の目標勉強時間（時間）（編集）",
-                    min_value=0.0,
-                    max_value=24.0,
-                    value=default_hr,
-                    step=0.5,
-                    key=f"edit_hrs_{edit_id}_{d}",
-                )
-                edit_schedule_dict[d] = hrs
-
-            st.markdown("#### 次回までの自習目標（編集）")
-            t1_old = targets_old[0] if len(targets_old) > 0 else ""
-            t2_old = targets_old[1] if len(targets_old) > 1 else ""
-            t3_old = targets_old[2] if len(targets_old) > 2 else ""
-
-            edit_target1 = st.text_input(
-                "目標1（編集）",
-                value=t1_old,
-                key=f"edit_target1_{edit_id}",
-            )
-            edit_target2 = st.text_input(
-                "目標2（編集）",
-                value=t2_old,
-                key=f"edit_target2_{edit_id}",
-            )
-            edit_target3 = st.text_input(
-                "目標3（編集）",
-                value=t3_old,
-                key=f"edit_target3_{edit_id}",
-            )
-            edit_targets_list = [edit_target1, edit_target2, edit_target3]
-
-            if st.button("この日報を更新", key=f"btn_update_coaching_{edit_id}"):
-                # 更新用の dict
-                new_student_eval = {
-                    "理解度": edit_stu_understanding,
-                    "目標達成度": edit_stu_goal,
-                    "モチベーション": edit_stu_motivation,
-                }
-                new_teacher_eval = {
-                    "授業態度": edit_tch_attitude,
-                    "宿題完成度": edit_tch_homework,
-                    "前回理解度": edit_tch_prev_understand,
-                    "コメント": edit_teacher_comment,
-                }
-
-                coaching_all = get_coaching_df()
-                if coaching_all.empty or "id" not in coaching_all.columns:
-                    st.error("日報データが見つかりませんでした。")
-                else:
-                    coaching_all["id"] = coaching_all["id"].astype(str)
-                    mask_all = coaching_all["id"] == edit_id
-                    if not mask_all.any():
-                        st.error("対象の日報データが見つかりませんでした。")
-                    else:
-                        idx_all = coaching_all[mask_all].index[0]
-                        coaching_all.at[idx_all, "date"] = edit_report_date.isoformat()
-                        coaching_all.at[idx_all, "student_eval_json"] = json.dumps(
-                            new_student_eval, ensure_ascii=False
-                        )
-                        coaching_all.at[idx_all, "teacher_eval_json"] = json.dumps(
-                            new_teacher_eval, ensure_ascii=False
-                        )
-                        coaching_all.at[idx_all, "study_schedule_json"] = json.dumps(
-                            edit_schedule_dict, ensure_ascii=False
-                        )
-                        coaching_all.at[idx_all, "study_targets_json"] = json.dumps(
-                            edit_targets_list, ensure_ascii=False
-                        )
-                        coaching_all.at[idx_all, "updated_at"] = datetime.now().isoformat()
-                        # ---- ここを追加（teacher_name列が無いと保存されない問題の保険）----
-                        for col in ["teacher_name", "teacher_username"]:
-                            if col not in coaching_all.columns:
-                                coaching_all[col] = ""
-                        # ★ ここが修正：講師名を入力値で保存
-                        coaching_all.at[idx_all, "teacher_username"] = teacher_username
-                        coaching_all.at[idx_all, "teacher_name"] = edit_teacher_name_to_save
-
-                        write_sheet_df("coaching_reports", coaching_all)
-                        try:
-                            load_sheet_df.clear()
-                        except Exception:
-                            pass
-                        try:
-                            load_all_tables.clear()
-                        except Exception:
-                            pass
-
-                        st.success("日報データを更新しました。")
-                        time.sleep(1)
-                        st.rerun()
+                    coaching_all = get_coaching_df()
+                    if coaching_all.empty or "id" not in coaching_all.columns:
+                        st.error("日報データが見つかりませんでした。")
+                    else:
+                        row_pos = coaching_all.attrs.get("id_index", {}).get(edit_id)
+                        if row_pos is None:
+                            st.error("対象の日報データが見つかりませんでした。")
+                        else:
+                            updated_row = coaching_all.loc[row_pos].to_dict()
+                            updated_row.update(
+                                {
+                                    "date": edit_report_date.isoformat(),
+                                    "student_eval_json": new_student_eval.to_json(),
+                                    "teacher_eval_json": new_teacher_eval.to_json(),
+                                    "study_schedule_json": _dumps(edit_schedule_dict),
+                                    "study_targets_json": _dumps(edit_targets_list),
+                                    "updated_at": datetime.now().isoformat(),
+                                    # 講師名を入力値で保存
+                                    "teacher_username": teacher_username,
+                                    "teacher_name": edit_teacher_name_to_save,
+                                }
+                            )
+                            # 対象の1行だけ範囲更新（全行の再送をしない）
+                            update_sheet_row("coaching_reports", row_pos, updated_row)
 
+                            _queue_flash("日報データを更新しました。")
+                            st.rerun(scope="app")
 
+            _coaching_edit()
 
 
     # ------------- 過去の日報履歴（閲覧）-------------
     st.markdown("---")
     st.subheader("過去の日報履歴")
 
-    coaching_df = get_coaching_df()
-
-    if not coaching_df.empty and "student_id" in coaching_df.columns:
-        coaching_df["student_id"] = coaching_df["student_id"].astype(str)
-
-        coaching_df_student = (
-            coaching_df[coaching_df["student_id"] == str(student_id)]
-            .copy()
-        )
-
+    if not coaching_df_student.empty:
         # date が文字列でも安全に並び替えできるように
         if "date" in coaching_df_student.columns:
             coaching_df_student["_date_sort"] = pd.to_datetime(
@@ -2031,8 +2507,6 @@ def page_coaching():
             ).drop(columns=["_date_sort"], errors="ignore")
         else:
             coaching_df_student = coaching_df_student.sort_index(ascending=False)
-    else:
-        coaching_df_student = pd.DataFrame()
 
     if coaching_df_student.empty:
         st.info("この生徒の日報はまだ登録されていません。")
@@ -2054,15 +2528,9 @@ def page_coaching():
             else:
                 st.caption("担当講師：（未設定）")
 
-            # JSON → 辞書
-            try:
-                se = json.loads(row.get("student_eval_json") or "{}")
-            except Exception:
-                se = {}
-            try:
-                te = json.loads(row.get("teacher_eval_json") or "{}")
-            except Exception:
-                te = {}
+            # JSON → 辞書（load 側でパース済み）
+            se = row.get("student_eval_json_parsed") or {}
+            te = row.get("teacher_eval_json_parsed") or {}
 
             col1, col2 = st.columns(2)
 
@@ -2089,9 +2557,7 @@ def page_coaching():
 
     # ------------- 日報削除 -------------
     with st.expander("日報の削除"):
-        delete_options = [
-            f'{row["id"]} : {row["date"]}' for _, row in coaching_df_student.iterrows()
-        ]
+        delete_options = _option_labels(coaching_df_student, ["id", "date"])
         selected_delete = st.selectbox(
             "削除する日報を選択",
             [""] + delete_options,
@@ -2103,20 +2569,11 @@ def page_coaching():
             else:
                 del_id = selected_delete.split(" : ")[0]
                 coaching_df_all = get_coaching_df()
-                if not coaching_df_all.empty and "id" in coaching_df_all.columns:
-                    coaching_df_all["id"] = coaching_df_all["id"].astype(str)
-                    coaching_df_all = coaching_df_all[coaching_df_all["id"] != del_id]
-                    write_sheet_df("coaching_reports", coaching_df_all)
-                    try:
-                        load_sheet_df.clear()
-                    except Exception:
-                        pass
-                    try:
-                        load_all_tables.clear()
-                    except Exception:
-                        pass
-                    st.success("日報を削除しました。")
-                    time.sleep(1)
+                del_pos = coaching_df_all.attrs.get("id_index", {}).get(del_id)
+                if del_pos is not None:
+                    # 対象の1行だけ削除（全行の再送をしない）
+                    delete_sheet_row("coaching_reports", del_pos)
+                    _queue_flash("日報を削除しました。")
                     st.rerun()
                 else:
                     st.error("日報データが見つかりませんでした。")
@@ -2126,6 +2583,66 @@ def page_coaching():
 # 英検対策ページ
 # -----------------
 
+@st.cache_data(ttl=300)
+def _eiken_analysis(student_id: str, fingerprint: str):
+    """英検演習の推移グラフ・一覧表用データを生徒単位でキャッシュして組み立てる。
+
+    fingerprint（行数 + 最終更新時刻）が変わらない限り再計算しない。
+    """
+    eiken_df_student = get_student_rows("eiken_records", student_id)
+    eiken_df_student = eiken_df_student.sort_values("practice_date")
+
+    if eiken_df_student.empty:
+        return [], [], [], [], [], []
+
+    # 横軸のラベル：日付部分のみ（時刻つき ISO 文字列は T の手前で切る）
+    x_labels = (
+        eiken_df_student["practice_date"]
+        .astype("string")
+        .fillna("")
+        .str.split("T")
+        .str[0]
+        .tolist()
+    )
+
+    # load 側で展開済みの scores.* 数値列から正答率を列演算で求める
+    skills = ("reading", "listening", "writing", "speaking")
+    needed = [f"scores.{s}.{k}" for s in skills for k in ("correct", "total")]
+    scores = eiken_df_student.reindex(columns=needed).fillna(0)
+
+    table = pd.DataFrame(
+        {
+            "ID": eiken_df_student["id"],
+            "演習日": x_labels,
+            "内容": eiken_df_student["category"],
+        }
+    )
+    rates = {}
+    for skill, c_label, r_label in (
+        ("reading", "R正解数", "R正答率(%)"),
+        ("listening", "L正解数", "L正答率(%)"),
+        ("writing", "W得点", "W正答率(%)"),
+        ("speaking", "S得点", "S正答率(%)"),
+    ):
+        c = scores[f"scores.{skill}.correct"]
+        t = scores[f"scores.{skill}.total"]
+        r = (c / t.where(t > 0) * 100).fillna(0)
+        rates[skill] = r.tolist()
+        table[c_label] = c.astype(int)
+        table[r_label] = r.round(1)
+    table["担当講師"] = eiken_df_student["teacher_name"]
+
+    rows = table.to_dict("records")
+    return (
+        x_labels,
+        rates["reading"],
+        rates["listening"],
+        rates["writing"],
+        rates["speaking"],
+        rows,
+    )
+
+
 def page_eiken():
     st.header("英検対策")
 
@@ -2138,26 +2655,17 @@ def page_eiken():
         st.info("生徒が登録されていません。")
         return
 
-    # student_id を文字列に統一
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
     student_label = st.selectbox(
         "生徒を選択",
-        [f'{row["student_id"]} : {row["name"]}' for _, row in students_df.iterrows()],
+        _option_labels(students_df, ["student_id", "name"]),
     )
     student_id = student_label.split(" : ")[0]
     student_name = student_label.split(" : ")[1]
 
     # ---------------- A. 目標級・本番受験日の設定 ----------------
-    eiken_df = get_eiken_df()
-    if not eiken_df.empty and "student_id" in eiken_df.columns:
-        eiken_df["student_id"] = eiken_df["student_id"].astype(str)
-        eiken_df_student = eiken_df[eiken_df["student_id"] == str(student_id)].sort_values(
-            "practice_date"
-        )
-    else:
-        eiken_df_student = pd.DataFrame()
+    eiken_df_student = get_student_rows("eiken_records", student_id)
+    if not eiken_df_student.empty:
+        eiken_df_student = eiken_df_student.sort_values("practice_date")
 
     st.subheader("A. 目標級・本番受験日の設定")
 
@@ -2172,7 +2680,7 @@ def page_eiken():
     selected_grade = st.selectbox(
         "目標級",
         EIKEN_GRADES,
-        index=EIKEN_GRADES.index(target_grade) if target_grade in EIKEN_GRADES else 2,
+        index=EIKEN_GRADE_INDEX.get(target_grade, 2),
     )
 
     exam_date_input = st.date_input(
@@ -2193,215 +2701,114 @@ def page_eiken():
     st.markdown("---")
     st.subheader("B. 過去問・演習レコーダー")
 
-    practice_date = st.date_input("演習日", value=date.today())
-    category = st.text_input("実施内容（例：2023年度第1回 過去問）")
-
-    st.markdown("#### 技能別の結果入力（正解数／得点のみ入力）")
+    # 正解数の入力ごとにページ全体（A〜Cすべて）を再実行しないようフラグメント化
+    @st.fragment
+    def _eiken_recorder():
+        practice_date = st.date_input("演習日", value=date.today())
+        category = st.text_input("実施内容（例：2023年度第1回 過去問）")
 
-    col1, col2 = st.columns(2)
-    with col1:
-        st.write(f"**Reading（全 {rd_total} 問中）**" if rd_total else "**Reading**")
-        rd_correct = st.number_input(
-            "Reading 正解数",
-            min_value=0,
-            max_value=rd_total if rd_total > 0 else 100,
-            value=0,
-            key="eiken_rd_correct",
-        )
-        rd_rate = (rd_correct / rd_total * 100) if rd_total else 0
-        st.caption(f"正答率：{rd_rate:.1f} %")
-
-        st.write(f"**Listening（全 {ls_total} 問中）**" if ls_total else "**Listening**")
-        ls_correct = st.number_input(
-            "Listening 正解数",
-            min_value=0,
-            max_value=ls_total if ls_total > 0 else 100,
-            value=0,
-            key="eiken_ls_correct",
-        )
-        ls_rate = (ls_correct / ls_total * 100) if ls_total else 0
-        st.caption(f"正答率：{ls_rate:.1f} %")
-
-    with col2:
-        st.write(f"**Writing（満点 {wr_total} 点）**" if wr_total else "**Writing**")
-        wr_correct = st.number_input(
-            "Writing 得点",
-            min_value=0,
-            max_value=wr_total if wr_total > 0 else 100,
-            value=0,
-            key="eiken_wr_correct",
-        )
-        wr_rate = (wr_correct / wr_total * 100) if wr_total else 0
-        st.caption(f"正答率：{wr_rate:.1f} %")
-
-        st.write(f"**Speaking（満点 {sp_total} 点）**" if sp_total else "**Speaking**")
-        sp_correct = st.number_input(
-            "Speaking 得点",
-            min_value=0,
-            max_value=sp_total if sp_total > 0 else 100,
-            value=0,
-            key="eiken_sp_correct",
-        )
-        sp_rate = (sp_correct / sp_total * 100) if sp_total else 0
-        st.caption(f"正答率：{sp_rate:.1f} %")
-
-    # ---------------- 保存処理（新規） ----------------
-    if st.button("演習記録を保存", key="save_eiken"):
-        eiken_all = get_eiken_df()
-
-        # 空シート対策 ＋ カラム保証（teacher_xxx も含める）
-        base_cols = [
-            "id",
-            "student_id",
-            "target_grade",
-            "exam_date",
-            "practice_date",
-            "category",
-            "scores_json",
-            "created_at",
-            "updated_at",
-            "teacher_username",
-            "teacher_name",
-        ]
-        if eiken_all.empty:
-            eiken_all = pd.DataFrame(columns=base_cols)
-        else:
-            for c in base_cols:
-                if c not in eiken_all.columns:
-                    eiken_all[c] = ""
+        st.markdown("#### 技能別の結果入力（正解数／得点のみ入力）")
 
-        # ID カラムを保証
-        if "id" not in eiken_all.columns:
-            eiken_all["id"] = ""
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**Reading（全 {rd_total} 問中）**" if rd_total else "**Reading**")
+            rd_correct = st.number_input(
+                "Reading 正解数",
+                min_value=0,
+                max_value=rd_total if rd_total > 0 else 100,
+                value=0,
+                key="eiken_rd_correct",
+            )
+            rd_rate = (rd_correct / rd_total * 100) if rd_total else 0
+            st.caption(f"正答率：{rd_rate:.1f} %")
 
-        # ID 採番
-        if eiken_all["id"].astype(str).str.strip().eq("").all():
-            new_id = 1
-        else:
-            ids = []
-            for v in eiken_all["id"]:
-                try:
-                    ids.append(int(v))
-                except Exception:
-                    pass
-            new_id = (max(ids) + 1) if ids else 1
+            st.write(f"**Listening（全 {ls_total} 問中）**" if ls_total else "**Listening**")
+            ls_correct = st.number_input(
+                "Listening 正解数",
+                min_value=0,
+                max_value=ls_total if ls_total > 0 else 100,
+                value=0,
+                key="eiken_ls_correct",
+            )
+            ls_rate = (ls_correct / ls_total * 100) if ls_total else 0
+            st.caption(f"正答率：{ls_rate:.1f} %")
 
-        now_str = datetime.now().isoformat()
+        with col2:
+            st.write(f"**Writing（満点 {wr_total} 点）**" if wr_total else "**Writing**")
+            wr_correct = st.number_input(
+                "Writing 得点",
+                min_value=0,
+                max_value=wr_total if wr_total > 0 else 100,
+                value=0,
+                key="eiken_wr_correct",
+            )
+            wr_rate = (wr_correct / wr_total * 100) if wr_total else 0
+            st.caption(f"正答率：{wr_rate:.1f} %")
 
-        # 保存するスコア（4技能すべて「correct / total」形式）
-        scores = {
-            "reading":   {"correct": rd_correct, "total": rd_total},
-            "listening": {"correct": ls_correct, "total": ls_total},
-            "writing":   {"correct": wr_correct, "total": wr_total},
-            "speaking":  {"correct": sp_correct, "total": sp_total},
-        }
+            st.write(f"**Speaking（満点 {sp_total} 点）**" if sp_total else "**Speaking**")
+            sp_correct = st.number_input(
+                "Speaking 得点",
+                min_value=0,
+                max_value=sp_total if sp_total > 0 else 100,
+                value=0,
+                key="eiken_sp_correct",
+            )
+            sp_rate = (sp_correct / sp_total * 100) if sp_total else 0
+            st.caption(f"正答率：{sp_rate:.1f} %")
+
+        # ---------------- 保存処理（新規） ----------------
+        if st.button("演習記録を保存", key="save_eiken"):
+            # スキーマ・文字列 id は load 側で保証済み
+            eiken_all = get_eiken_df()
+
+            # ID 採番（数値化できる id の最大値 + 1）
+            max_id = pd.to_numeric(eiken_all["id"], errors="coerce").max()
+            new_id = 1 if pd.isna(max_id) else int(max_id) + 1
+
+            now_str = datetime.now().isoformat()
+
+            # 保存するスコア（4技能すべて「correct / total」形式）
+            scores = {
+                "reading":   {"correct": rd_correct, "total": rd_total},
+                "listening": {"correct": ls_correct, "total": ls_total},
+                "writing":   {"correct": wr_correct, "total": wr_total},
+                "speaking":  {"correct": sp_correct, "total": sp_total},
+            }
 
-        new_row = {
-            "id": str(new_id),
-            "student_id": str(student_id),
-            "target_grade": selected_grade,
-            "exam_date": exam_date_input.isoformat(),
-            "practice_date": practice_date.isoformat(),
-            "category": category,
-            "scores_json": json.dumps(scores, ensure_ascii=False),
-            "created_at": now_str,
-            "updated_at": now_str,
-            "teacher_username": teacher_username,
-            "teacher_name": teacher_name,
-        }
-        eiken_all = pd.concat([eiken_all, pd.DataFrame([new_row])], ignore_index=True)
-        write_sheet_df("eiken_records", eiken_all)
+            new_row = {
+                "id": str(new_id),
+                "student_id": str(student_id),
+                "target_grade": selected_grade,
+                "exam_date": exam_date_input.isoformat(),
+                "practice_date": practice_date.isoformat(),
+                "category": category,
+                "scores_json": _dumps(scores),
+                "created_at": now_str,
+                "updated_at": now_str,
+                "teacher_username": teacher_username,
+                "teacher_name": teacher_name,
+            }
+            # 1行の追加は append だけで済ませる
+            append_sheet_rows("eiken_records", [new_row])
 
-        # キャッシュクリアして即反映
-        try:
-            load_all_tables.clear()
-        except Exception:
-            pass
-        try:
-            load_sheet_df.clear()
-        except Exception:
-            pass
+            _queue_flash("英検演習記録を保存しました。")
+            st.rerun(scope="app")
 
-        st.success("英検演習記録を保存しました。")
-        time.sleep(0.5)
-        st.rerun()
+    _eiken_recorder()
 
     # ---------------- C. 分析・推移 ----------------
     st.markdown("---")
     st.subheader("C. 分析・推移")
 
-    eiken_df = get_eiken_df()
-    if not eiken_df.empty and "student_id" in eiken_df.columns:
-        eiken_df["student_id"] = eiken_df["student_id"].astype(str)
-        eiken_df_student = eiken_df[eiken_df["student_id"] == str(student_id)].sort_values(
-            "practice_date"
-        )
-        if "id" in eiken_df_student.columns:
-            eiken_df_student = eiken_df_student.copy()
-            eiken_df_student["id"] = eiken_df_student["id"].astype(str)
-    else:
-        eiken_df_student = pd.DataFrame()
-
+    # A セクションで取得・ソート済みの生徒別データを使い回す
     if eiken_df_student.empty:
         st.info("この生徒の英検演習記録はまだありません。")
     else:
-        rows = []
-        x_labels = []
-        rd_rates = []
-        ls_rates = []
-        wr_rates = []
-        sp_rates = []
-
-        for _, row in eiken_df_student.iterrows():
-            try:
-                s = json.loads(row.get("scores_json") or "{}")
-            except Exception:
-                s = {}
-
-            # 4技能の正解数・正答率
-            def get_rate(skill_key):
-                info = s.get(skill_key, {}) or {}
-                c = info.get("correct", 0)
-                t = info.get("total", 0)
-                rate = (c / t * 100) if t else 0
-                return c, t, rate
-
-            rd_c, rd_t, rd_r = get_rate("reading")
-            ls_c, ls_t, ls_r = get_rate("listening")
-            wr_c, wr_t, wr_r = get_rate("writing")
-            sp_c, sp_t, sp_r = get_rate("speaking")
-
-            # 横軸のラベル：日付のみ（時刻なし）
-            p_raw = row.get("practice_date", "")
-            label = ""
-            try:
-                d = datetime.fromisoformat(p_raw)
-                label = d.date().isoformat()
-            except Exception:
-                label = str(p_raw).split("T")[0] if "T" in str(p_raw) else str(p_raw)
-
-            x_labels.append(label)
-            rd_rates.append(rd_r)
-            ls_rates.append(ls_r)
-            wr_rates.append(wr_r)
-            sp_rates.append(sp_r)
-
-            rows.append(
-                {
-                    "ID": row["id"],
-                    "演習日": label,
-                    "内容": row.get("category", ""),
-                    "R正解数": rd_c,
-                    "R正答率(%)": round(rd_r, 1),
-                    "L正解数": ls_c,
-                    "L正答率(%)": round(ls_r, 1),
-                    "W得点": wr_c,
-                    "W正答率(%)": round(wr_r, 1),
-                    "S得点": sp_c,
-                    "S正答率(%)": round(sp_r, 1),
-                    "担当講師": row.get("teacher_name", ""),
-                }
-            )
+        # 行数と最終更新時刻が変わらない限りキャッシュ済みの集計を使う
+        fingerprint = f'{len(eiken_df_student)}:{eiken_df_student["updated_at"].max()}'
+        x_labels, rd_rates, ls_rates, wr_rates, sp_rates, rows = _eiken_analysis(
+            str(student_id), fingerprint
+        )
 
         # 正答率グラフ（横軸は「日付のみ」）
         st.markdown("##### 技能別正答率の推移（4技能）")
@@ -2435,10 +2842,7 @@ def page_eiken():
         if eiken_df_student.empty or "id" not in eiken_df_student.columns:
             st.info("編集可能な英検演習データがありません。")
         else:
-            edit_options = [
-                f'{row["id"]} : {row["practice_date"]} {row.get("category", "")}'
-                for _, row in eiken_df_student.iterrows()
-            ]
+            edit_options = _option_labels(eiken_df_student, ["id", "practice_date", "category"])
             selected_edit = st.selectbox(
                 "編集する演習記録を選択",
                 [""] + edit_options,
@@ -2449,176 +2853,169 @@ def page_eiken():
                 edit_id = selected_edit.split(" : ")[0]
                 target_row = eiken_df_student[eiken_df_student["id"] == edit_id].iloc[0]
 
-                st.markdown("### 演習記録の内容を編集")
+                # 入力操作でページ全体を再実行しないようフラグメント化（保存時のみ全体更新）
+                @st.fragment
+                def _eiken_edit():
+                    st.markdown("### 演習記録の内容を編集")
 
-                # 既存値の取得
-                old_grade = target_row.get("target_grade", "")
-                old_exam_date = target_row.get("exam_date", "")
-                old_practice_date = target_row.get("practice_date", "")
-                old_category = target_row.get("category", "")
+                    # 既存値の取得
+                    old_grade = target_row.get("target_grade", "")
+                    old_exam_date = target_row.get("exam_date", "")
+                    old_practice_date = target_row.get("practice_date", "")
+                    old_category = target_row.get("category", "")
 
-                # scores_json → dict
-                try:
-                    old_scores = json.loads(target_row.get("scores_json") or "{}")
-                except Exception:
-                    old_scores = {}
+                    # scores_json → dict（load 側でパース済み）
+                    old_scores = target_row.get("scores_json_parsed") or {}
+
+                    def _get_skill_info(key):
+                        info = old_scores.get(key, {}) or {}
+                        c = info.get("correct", 0)
+                        t = info.get("total", 0)
+                        try:
+                            c = int(c)
+                        except Exception:
+                            c = 0
+                        try:
+                            t = int(t)
+                        except Exception:
+                            t = 0
+                        return c, t
+
+                    rd_c_old, rd_t_old = _get_skill_info("reading")
+                    ls_c_old, ls_t_old = _get_skill_info("listening")
+                    wr_c_old, wr_t_old = _get_skill_info("writing")
+                    sp_c_old, sp_t_old = _get_skill_info("speaking")
+
+                    # 日付などの編集
+                    edit_grade = st.selectbox(
+                        "目標級（編集）",
+                        EIKEN_GRADES,
+                        index=EIKEN_GRADE_INDEX.get(old_grade, 2),
+                        key=f"edit_eiken_grade_{edit_id}",
+                    )
 
-                def _get_skill_info(key):
-                    info = old_scores.get(key, {}) or {}
-                    c = info.get("correct", 0)
-                    t = info.get("total", 0)
                     try:
-                        c = int(c)
+                        exam_date_val = datetime.fromisoformat(old_exam_date).date()
                     except Exception:
-                        c = 0
+                        exam_date_val = date.today()
+                    edit_exam_date = st.date_input(
+                        "本番受験日（編集）",
+                        value=exam_date_val,
+                        key=f"edit_eiken_exam_date_{edit_id}",
+                    )
+
                     try:
-                        t = int(t)
+                        practice_date_val = datetime.fromisoformat(old_practice_date).date()
                     except Exception:
-                        t = 0
-                    return c, t
-
-                rd_c_old, rd_t_old = _get_skill_info("reading")
-                ls_c_old, ls_t_old = _get_skill_info("listening")
-                wr_c_old, wr_t_old = _get_skill_info("writing")
-                sp_c_old, sp_t_old = _get_skill_info("speaking")
-
-                # 日付などの編集
-                edit_grade = st.selectbox(
-                    "目標級（編集）",
-                    EIKEN_GRADES,
-                    index=EIKEN_GRADES.index(old_grade) if old_grade in EIKEN_GRADES else 2,
-                    key=f"edit_eiken_grade_{edit_id}",
-                )
+                        # practice_date が date-only 文字列の場合も想定
+                        try:
+                            practice_date_val = datetime.strptime(str(old_practice_date), "%Y-%m-%d").date()
+                        except Exception:
+                            practice_date_val = date.today()
+                    edit_practice_date = st.date_input(
+                        "演習日（編集）",
+                        value=practice_date_val,
+                        key=f"edit_eiken_practice_date_{edit_id}",
+                    )
 
-                try:
-                    exam_date_val = datetime.fromisoformat(old_exam_date).date()
-                except Exception:
-                    exam_date_val = date.today()
-                edit_exam_date = st.date_input(
-                    "本番受験日（編集）",
-                    value=exam_date_val,
-                    key=f"edit_eiken_exam_date_{edit_id}",
-                )
+                    edit_category = st.text_input(
+                        "実施内容（編集）",
+                        value=old_category,
+                        key=f"edit_eiken_category_{edit_id}",
+                    )
 
-                try:
-                    practice_date_val = datetime.fromisoformat(old_practice_date).date()
-                except Exception:
-                    # practice_date が date-only 文字列の場合も想定
-                    try:
-                        practice_date_val = datetime.strptime(str(old_practice_date), "%Y-%m-%d").date()
-                    except Exception:
-                        practice_date_val = date.today()
-                edit_practice_date = st.date_input(
-                    "演習日（編集）",
-                    value=practice_date_val,
-                    key=f"edit_eiken_practice_date_{edit_id}",
-                )
+                    st.markdown("#### 技能別の結果編集")
 
-                edit_category = st.text_input(
-                    "実施内容（編集）",
-                    value=old_category,
-                    key=f"edit_eiken_category_{edit_id}",
-                )
+                    col1_e, col2_e = st.columns(2)
+                    with col1_e:
+                        st.write(f"**Reading（全 {rd_t_old} 問中）**" if rd_t_old else "**Reading**")
+                        edit_rd_correct = st.number_input(
+                            "Reading 正解数（編集）",
+                            min_value=0,
+                            max_value=rd_t_old if rd_t_old > 0 else 100,
+                            value=rd_c_old,
+                            key=f"edit_eiken_rd_correct_{edit_id}",
+                        )
+                        rd_rate_edit = (edit_rd_correct / rd_t_old * 100) if rd_t_old else 0
+                        st.caption(f"正答率：{rd_rate_edit:.1f} %")
 
-                st.markdown("#### 技能別の結果編集")
-
-                col1_e, col2_e = st.columns(2)
-                with col1_e:
-                    st.write(f"**Reading（全 {rd_t_old} 問中）**" if rd_t_old else "**Reading**")
-                    edit_rd_correct = st.number_input(
-                        "Reading 正解数（編集）",
-                        min_value=0,
-                        max_value=rd_t_old if rd_t_old > 0 else 100,
-                        value=rd_c_old,
-                        key=f"edit_eiken_rd_correct_{edit_id}",
-                    )
-                    rd_rate_edit = (edit_rd_correct / rd_t_old * 100) if rd_t_old else 0
-                    st.caption(f"正答率：{rd_rate_edit:.1f} %")
-
-                    st.write(f"**Listening（全 {ls_t_old} 問中）**" if ls_t_old else "**Listening**")
-                    edit_ls_correct = st.number_input(
-                        "Listening 正解数（編集）",
-                        min_value=0,
-                        max_value=ls_t_old if ls_t_old > 0 else 100,
-                        value=ls_c_old,
-                        key=f"edit_eiken_ls_correct_{edit_id}",
-                    )
-                    ls_rate_edit = (edit_ls_correct / ls_t_old * 100) if ls_t_old else 0
-                    st.caption(f"正答率：{ls_rate_edit:.1f} %")
-
-                with col2_e:
-                    st.write(f"**Writing（満点 {wr_t_old} 点）**" if wr_t_old else "**Writing**")
-                    edit_wr_correct = st.number_input(
-                        "Writing 得点（編集）",
-                        min_value=0,
-                        max_value=wr_t_old if wr_t_old > 0 else 100,
-                        value=wr_c_old,
-                        key=f"edit_eiken_wr_correct_{edit_id}",
-                    )
-                    wr_rate_edit = (edit_wr_correct / wr_t_old * 100) if wr_t_old else 0
-                    st.caption(f"正答率：{wr_rate_edit:.1f} %")
-
-                    st.write(f"**Speaking（満点 {sp_t_old} 点）**" if sp_t_old else "**Speaking**")
-                    edit_sp_correct = st.number_input(
-                        "Speaking 得点（編集）",
-                        min_value=0,
-                        max_value=sp_t_old if sp_t_old > 0 else 100,
-                        value=sp_c_old,
-                        key=f"edit_eiken_sp_correct_{edit_id}",
-                    )
-                    sp_rate_edit = (edit_sp_correct / sp_t_old * 100) if sp_t_old else 0
-                    st.caption(f"正答率：{sp_rate_edit:.1f} %")
-
-                if st.button("この演習記録を更新", key=f"btn_update_eiken_{edit_id}"):
-                    # 新しい scores_json
-                    new_scores = {
-                        "reading":   {"correct": edit_rd_correct, "total": rd_t_old},
-                        "listening": {"correct": edit_ls_correct, "total": ls_t_old},
-                        "writing":   {"correct": edit_wr_correct, "total": wr_t_old},
-                        "speaking":  {"correct": edit_sp_correct, "total": sp_t_old},
-                    }
+                        st.write(f"**Listening（全 {ls_t_old} 問中）**" if ls_t_old else "**Listening**")
+                        edit_ls_correct = st.number_input(
+                            "Listening 正解数（編集）",
+                            min_value=0,
+                            max_value=ls_t_old if ls_t_old > 0 else 100,
+                            value=ls_c_old,
+                            key=f"edit_eiken_ls_correct_{edit_id}",
+                        )
+                        ls_rate_edit = (edit_ls_correct / ls_t_old * 100) if ls_t_old else 0
+                        st.caption(f"正答率：{ls_rate_edit:.1f} %")
 
-                    eiken_all_for_update = get_eiken_df()
-                    if eiken_all_for_update.empty or "id" not in eiken_all_for_update.columns:
-                        st.error("英検データが見つかりませんでした。")
-                    else:
-                        eiken_all_for_update["id"] = eiken_all_for_update["id"].astype(str)
-                        mask_all = eiken_all_for_update["id"] == edit_id
-                        if not mask_all.any():
-                            st.error("対象の英検演習データが見つかりませんでした。")
+                    with col2_e:
+                        st.write(f"**Writing（満点 {wr_t_old} 点）**" if wr_t_old else "**Writing**")
+                        edit_wr_correct = st.number_input(
+                            "Writing 得点（編集）",
+                            min_value=0,
+                            max_value=wr_t_old if wr_t_old > 0 else 100,
+                            value=wr_c_old,
+                            key=f"edit_eiken_wr_correct_{edit_id}",
+                        )
+                        wr_rate_edit = (edit_wr_correct / wr_t_old * 100) if wr_t_old else 0
+                        st.caption(f"正答率：{wr_rate_edit:.1f} %")
+
+                        st.write(f"**Speaking（満点 {sp_t_old} 点）**" if sp_t_old else "**Speaking**")
+                        edit_sp_correct = st.number_input(
+                            "Speaking 得点（編集）",
+                            min_value=0,
+                            max_value=sp_t_old if sp_t_old > 0 else 100,
+                            value=sp_c_old,
+                            key=f"edit_eiken_sp_correct_{edit_id}",
+                        )
+                        sp_rate_edit = (edit_sp_correct / sp_t_old * 100) if sp_t_old else 0
+                        st.caption(f"正答率：{sp_rate_edit:.1f} %")
+
+                    if st.button("この演習記録を更新", key=f"btn_update_eiken_{edit_id}"):
+                        # 新しい scores_json
+                        new_scores = {
+                            "reading":   {"correct": edit_rd_correct, "total": rd_t_old},
+                            "listening": {"correct": edit_ls_correct, "total": ls_t_old},
+                            "writing":   {"correct": edit_wr_correct, "total": wr_t_old},
+                            "speaking":  {"correct": edit_sp_correct, "total": sp_t_old},
+                        }
+
+                        eiken_all_for_update = get_eiken_df()
+                        if eiken_all_for_update.empty or "id" not in eiken_all_for_update.columns:
+                            st.error("英検データが見つかりませんでした。")
                         else:
-                            idx_all = eiken_all_for_update[mask_all].index[0]
-                            eiken_all_for_update.at[idx_all, "target_grade"] = edit_grade
-                            eiken_all_for_update.at[idx_all, "exam_date"] = edit_exam_date.isoformat()
-                            eiken_all_for_update.at[idx_all, "practice_date"] = edit_practice_date.isoformat()
-                            eiken_all_for_update.at[idx_all, "category"] = edit_category
-                            eiken_all_for_update.at[idx_all, "scores_json"] = json.dumps(
-                                new_scores, ensure_ascii=False
+                            row_pos = eiken_all_for_update.attrs.get("id_index", {}).get(
+                                edit_id
                             )
-                            eiken_all_for_update.at[idx_all, "updated_at"] = datetime.now().isoformat()
-                            eiken_all_for_update.at[idx_all, "teacher_username"] = teacher_username
-                            eiken_all_for_update.at[idx_all, "teacher_name"] = teacher_name
-
-                            write_sheet_df("eiken_records", eiken_all_for_update)
-                            try:
-                                load_all_tables.clear()
-                            except Exception:
-                                pass
-                            try:
-                                load_sheet_df.clear()
-                            except Exception:
-                                pass
-
-                            st.success("英検演習記録を更新しました。")
-                            time.sleep(1)
-                            st.rerun()
+                            if row_pos is None:
+                                st.error("対象の英検演習データが見つかりませんでした。")
+                            else:
+                                updated_row = eiken_all_for_update.loc[row_pos].to_dict()
+                                updated_row.update(
+                                    {
+                                        "target_grade": edit_grade,
+                                        "exam_date": edit_exam_date.isoformat(),
+                                        "practice_date": edit_practice_date.isoformat(),
+                                        "category": edit_category,
+                                        "scores_json": _dumps(new_scores),
+                                        "updated_at": datetime.now().isoformat(),
+                                        "teacher_username": teacher_username,
+                                        "teacher_name": teacher_name,
+                                    }
+                                )
+                                # 対象の1行だけ範囲更新（全行の再送をしない）
+                                update_sheet_row("eiken_records", row_pos, updated_row)
+
+                                _queue_flash("英検演習記録を更新しました。")
+                                st.rerun(scope="app")
+
+                _eiken_edit()
 
         # ---------------- 削除 ----------------
         with st.expander("英検演習記録の削除"):
-            delete_options = [
-                f'{row["id"]} : {row["practice_date"]} {row.get("category", "")}'
-                for _, row in eiken_df_student.iterrows()
-            ]
+            delete_options = _option_labels(eiken_df_student, ["id", "practice_date", "category"])
             selected_delete = st.selectbox(
                 "削除する演習記録を選択",
                 [""] + delete_options,
@@ -2630,29 +3027,341 @@ def page_eiken():
                 else:
                     del_id = selected_delete.split(" : ")[0]
                     eiken_all = get_eiken_df()
-                    if not eiken_all.empty and "id" in eiken_all.columns:
-                        eiken_all["id"] = eiken_all["id"].astype(str)
-                        eiken_all = eiken_all[eiken_all["id"] != del_id]
-                        write_sheet_df("eiken_records", eiken_all)
-                        try:
-                            load_all_tables.clear()
-                        except Exception:
-                            pass
-                        try:
-                            load_sheet_df.clear()
-                        except Exception:
-                            pass
-                        st.success("英検演習記録を削除しました。")
-                        time.sleep(1)
+                    del_pos = eiken_all.attrs.get("id_index", {}).get(del_id)
+                    if del_pos is not None:
+                        # 対象の1行だけ削除（全行の再送をしない）
+                        delete_sheet_row("eiken_records", del_pos)
+                        _queue_flash("英検演習記録を削除しました。")
                         st.rerun()
                     else:
                         st.error("英検データが見つかりませんでした。")
 
 
+# -----------------
+# 保護者報告作成（Communication Sheet）
+# -----------------
+
+# ---------- 保護者レポートの iframe シェル（CSS・枠は定数で一度だけ組む） ----------
+_REPORT_CSS = """
+<style>
+@page {
+  size: A4 portrait;
+  margin: 5mm 8mm;
+}
+body {
+  margin: 0;
+  padding: 16px;
+  font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
+  background: #f5f5f5;
+}
+.report-container {
+  max-width: 900px;
+  margin: 0 auto;
+  background: #ffffff;
+  padding: 24px 32px;
+  box-shadow: 0 2px 8px rgba(0,0,0,0.08);
+  box-sizing: border-box;
+}
+.report-header {
+  font-size: 20px;
+  font-weight: 600;
+  margin-bottom: 16px;
+  border-bottom: 2px solid #4a90e2;
+  padding-bottom: 8px;
+}
+.report-section-title {
+  font-size: 16px;
+  font-weight: 600;
+  margin-top: 24px;
+  margin-bottom: 8px;
+  color: #333333;
+}
+.subsection-title {
+  font-size: 14px;
+  font-weight: 600;
+  margin-top: 16px;
+  margin-bottom: 4px;
+}
+.summary-grid {
+  display: flex;
+  flex-wrap: wrap;
+  gap: 8px;
+  margin-bottom: 8px;
+}
+.summary-item {
+  flex: 1 1 200px;
+  background: #f5f7ff;
+  border-radius: 8px;
+  padding: 8px 10px;
+}
+.summary-label {
+  font-size: 12px;
+  color: #555555;
+}
+.summary-value {
+  font-size: 16px;
+  font-weight: 600;
+  color: #222222;
+}
+.score-table {
+  border-collapse: collapse;
+  width: 100%;
+  font-size: 13px;
+  margin-top: 4px;
+}
+.score-table th,
+.score-table td {
+  border: 1px solid #cccccc;
+  padding: 4px 6px;
+}
+.score-table th {
+  background: #eef3ff;
+  font-weight: 600;
+}
+.toolbar {
+  display: flex;
+  gap: 8px;
+  margin-bottom: 12px;
+}
+.toolbar button {
+  padding: 6px 12px;
+  font-size: 13px;
+  border-radius: 6px;
+  border: none;
+  cursor: pointer;
+  background: #4a90e2;
+  color: #ffffff;
+}
+.toolbar button.secondary {
+  background: #777777;
+}
+.toolbar button:hover {
+  opacity: 0.9;
+}
+.plotly-graph-div, .js-plotly-plot {
+  max-width: 100% !important;
+}
+@media print {
+  body {
+    background: #ffffff;
+    -webkit-print-color-adjust: exact;
+    print-color-adjust: exact;
+  }
+  .toolbar {
+    display: none !important;
+  }
+}
+</style>
+"""
+
+# __BODY__ をレポート本文で置き換えて使う
+_REPORT_SHELL = """
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8" />
+<title>保護者向けレポート</title>
+{CSS}
+<script src="https://cdn.plot.ly/plotly-2.35.2.min.js"></script>
+</head>
+<body>
+<div class="toolbar">
+  <button onclick="openInNewTab()" type="button">別タブでレポートを表示</button>
+  <button class="secondary" onclick="window.print()" type="button">
+    このレポートをPDFで保存 / 印刷
+  </button>
+</div>
+<div id="report-root" class="report-container">
+__BODY__
+</div>
+
+<script>
+function openInNewTab() {
+  const reportRoot = document.getElementById('report-root');
+  if (!reportRoot) {
+    alert('レポートが見つかりません。');
+    return;
+  }
+  const newWin = window.open('', '_blank');
+  if (!newWin) {
+    alert('ポップアップがブロックされています。');
+    return;
+  }
+  newWin.document.write(`<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8" />
+<title>保護者向けレポート</title>
+{CSS}
+</head>
+<body>${reportRoot.outerHTML}</body>
+</html>`);
+  newWin.document.close();
+  newWin.focus();
+}
+</script>
+</body>
+</html>
+""".replace("{CSS}", _REPORT_CSS)
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _build_report_payload(sid: str, year: int, month: int, fingerprint: str) -> dict:
+    """保護者レポートの集計部分を生徒・年月単位でキャッシュして組み立てる。
+
+    fingerprint にはスプレッドシートの modifiedTime を渡す。書き込みで
+    値が変わる（またはキャッシュが破棄される）ため、同じ選択での再生成は
+    集計をやり直さずキャッシュから返せる。
+    """
+
+    # 生徒別の事前グループ化から取り出す（student_id は文字列正規化済み）
+    coaching_df = get_student_rows("coaching_reports", sid)
+
+    # 対象月の開始・終了
+    start_date = date(int(year), int(month), 1)
+    if month == 12:
+        end_date = date(int(year) + 1, 1, 1)
+    else:
+        end_date = date(int(year), int(month) + 1, 1)
+
+    # --- 日報の集計（この月の分） ---
+    # 行ごとの fromisoformat ではなく、一括の to_datetime + boolean マスクで
+    # 月内の行を切り出す（パースできない日付は coerce で落ちる）。
+    # datetime64 と Timestamp の比較は int64 のベクトル比較で済む
+    start_ts = pd.Timestamp(start_date)
+    end_ts = pd.Timestamp(end_date)
+    coaching_dates = pd.to_datetime(coaching_df["date"], errors="coerce")
+    records_month = coaching_df.loc[
+        (coaching_dates >= start_ts) & (coaching_dates < end_ts)
+    ]
+
+    num_sessions = len(records_month)
+    dates_list = records_month["date"].tolist()
+
+    # 行ごとの json.loads はせず、load 側でパース済みの列を json_normalize で
+    # 評価項目ごとの数値列に一括展開する（欠損・非数値は coerce で NaN）
+    if num_sessions:
+        se = pd.json_normalize(
+            records_month["student_eval_json_parsed"]
+        ).set_axis(records_month.index)
+        te = pd.json_normalize(
+            records_month["teacher_eval_json_parsed"]
+        ).set_axis(records_month.index)
+    else:
+        se = te = pd.DataFrame()
+
+    def _metric(frame: pd.DataFrame, key: str) -> pd.Series:
+        if key in frame.columns:
+            return pd.to_numeric(frame[key], errors="coerce")
+        return pd.Series(float("nan"), index=records_month.index)
+
+    def _series_pairs(values: pd.Series) -> list:
+        # (日付, 値) のリスト。欠損はグラフで欠点になるよう None にする
+        return [
+            (d, None if pd.isna(v) else v) for d, v in zip(dates_list, values)
+        ]
+
+    u = _metric(se, "理解度")
+    hw = _metric(te, "宿題完成度")
+
+    stu_understanding_series = _series_pairs(u)
+    stu_goal_series = _series_pairs(_metric(se, "目標達成度"))
+    stu_motivation_series = _series_pairs(_metric(se, "モチベーション"))
+    tch_attitude_series = _series_pairs(_metric(te, "授業態度"))
+    tch_homework_series = _series_pairs(hw)
+    tch_prev_understand_series = _series_pairs(_metric(te, "前回理解度"))
+
+    avg_understanding = float(u.mean()) if u.notna().any() else 0
+    avg_homework = float(hw.mean()) if hw.notna().any() else 0
+
+    # 自習予定の時間合計（パース済み dict の値をまとめて数値化して合算）
+    sched_values = [
+        v
+        for d in records_month["study_schedule_json_parsed"]
+        for v in (d or {}).values()
+    ]
+    total_hours = float(
+        pd.to_numeric(pd.Series(sched_values), errors="coerce").sum()
+    ) if sched_values else 0.0
+
+    # --- 英検情報 ---
+    eiken_df_student = get_student_rows("eiken_records", sid).sort_values("practice_date")
+    has_eiken = not eiken_df_student.empty
+
+    current_target_grade = ""
+    current_exam_date = ""
+    month_eiken_table = pd.DataFrame()
+
+    if has_eiken:
+        last = eiken_df_student.iloc[-1]
+        current_target_grade = last.get("target_grade", "")
+        current_exam_date = last.get("exam_date", "")
+
+        # 月内の行を一括マスクで切り出す（行ごとの fromisoformat をしない）
+        practice_dates = pd.to_datetime(
+            eiken_df_student["practice_date"], errors="coerce"
+        )
+        sub = eiken_df_student.loc[
+            (practice_dates >= start_ts) & (practice_dates < end_ts)
+        ]
+
+        if not sub.empty:
+            # load 側で展開済みの scores.* 数値列をそのまま使う
+            skills = ("reading", "listening", "writing", "speaking")
+            needed = [f"scores.{s}.{k}" for s in skills for k in ("correct", "total")]
+            scores = sub.reindex(columns=needed).fillna(0)
+
+            month_eiken_table = pd.DataFrame(
+                {"演習日": sub["practice_date"], "内容": sub["category"]}
+            )
+            for skill, c_label, r_label in (
+                ("reading", "R正解数", "R正答率(%)"),
+                ("listening", "L正解数", "L正答率(%)"),
+                ("writing", "W得点", "W正答率(%)"),
+                ("speaking", "S得点", "S正答率(%)"),
+            ):
+                c = scores[f"scores.{skill}.correct"]
+                t = scores[f"scores.{skill}.total"]
+                month_eiken_table[c_label] = c.astype(int)
+                # total が 0 の行は正答率 0 とする（ゼロ除算を where で回避）
+                month_eiken_table[r_label] = (
+                    (c / t.where(t > 0) * 100).fillna(0).round(1)
+                )
+
+    # --- 成績（入塾〜現在：グラフ用） ---
+    exam_df_stu_all = get_student_rows("exam_results", sid)
+    if not exam_df_stu_all.empty:
+        exam_df_stu_all["date_dt"] = pd.to_datetime(exam_df_stu_all["date"], errors="coerce")
+        exam_df_stu_all = exam_df_stu_all.sort_values("date_dt")
+
+    # 年内のテストは事前計算済みの date_dt 列へのマスクで切り出す
+    if not exam_df_stu_all.empty:
+        year_exam_df = exam_df_stu_all.loc[
+            exam_df_stu_all["date_dt"].dt.year == int(year)
+        ]
+    else:
+        year_exam_df = exam_df_stu_all
+
+    return {
+        "num_sessions": num_sessions,
+        "total_hours": total_hours,
+        "avg_understanding": avg_understanding,
+        "avg_homework": avg_homework,
+        "dates_list": dates_list,
+        "stu_understanding_series": stu_understanding_series,
+        "stu_goal_series": stu_goal_series,
+        "stu_motivation_series": stu_motivation_series,
+        "tch_attitude_series": tch_attitude_series,
+        "tch_homework_series": tch_homework_series,
+        "tch_prev_understand_series": tch_prev_understand_series,
+        "has_eiken": has_eiken,
+        "current_target_grade": current_target_grade,
+        "current_exam_date": current_exam_date,
+        "month_eiken_table": month_eiken_table,
+        "exam_df_stu_all": exam_df_stu_all,
+        "year_exam_df": year_exam_df,
+    }
 
-# -----------------
-# 保護者報告作成（Communication Sheet）
-# -----------------
 
 def page_parent_report():
     import html
@@ -2673,10 +3382,6 @@ def page_parent_report():
         st.markdown('</div>', unsafe_allow_html=True)
         return
 
-    # student_id を文字列に統一
-    if "student_id" in students_df.columns:
-        students_df["student_id"] = students_df["student_id"].astype(str)
-
     # （任意）既存の印刷モード：サイドバー非表示など
     with st.expander("印刷モード（サイドバーを隠す）"):
         print_mode = st.checkbox("印刷モード（サイドバーとヘッダーを隠す）を有効にする")
@@ -2686,7 +3391,7 @@ def page_parent_report():
     # 生徒選択
     student_label = st.selectbox(
         "生徒を選択",
-        [f'{row["student_id"]} : {row["name"]}' for _, row in students_df.iterrows()],
+        _option_labels(students_df, ["student_id", "name"]),
     )
     student_id = student_label.split(" : ")[0]
     student_name = student_label.split(" : ")[1]
@@ -2711,178 +3416,31 @@ def page_parent_report():
 
     # ---------- データ集計 ----------
     sid = str(student_id)
-
-    coaching_df = get_coaching_df()
-    exam_df = get_exam_results_df()
-    eiken_df = get_eiken_df()
-
-    if not coaching_df.empty and "student_id" in coaching_df.columns:
-        coaching_df["student_id"] = coaching_df["student_id"].astype(str)
-        coaching_df = coaching_df[coaching_df["student_id"] == sid]
-
-    if not exam_df.empty and "student_id" in exam_df.columns:
-        exam_df["student_id"] = exam_df["student_id"].astype(str)
-
-    if not eiken_df.empty and "student_id" in eiken_df.columns:
-        eiken_df["student_id"] = eiken_df["student_id"].astype(str)
-
-    # 対象月の開始・終了
-    start_date = date(int(year), int(month), 1)
-    if month == 12:
-        end_date = date(int(year) + 1, 1, 1)
-    else:
-        end_date = date(int(year), int(month) + 1, 1)
-
-    # --- 日報の集計（この月の分） ---
-    records_month = []
-    for _, row in coaching_df.iterrows():
-        try:
-            d = datetime.fromisoformat(row["date"]).date()
-        except Exception:
-            continue
-        if start_date <= d < end_date:
-            records_month.append(row)
-
-    num_sessions = len(records_month)
-    total_hours = 0.0
-    stu_understanding_list = []
-    tch_homework_list = []
-    dates_list = []
-    stu_understanding_series = []
-    stu_goal_series = []
-    stu_motivation_series = []
-    tch_attitude_series = []
-    tch_homework_series = []
-    tch_prev_understand_series = []
-
-    for row in records_month:
-        d_str = row["date"]
-        try:
-            _ = datetime.fromisoformat(d_str).date()
-        except Exception:
-            continue
-
-        dates_list.append(d_str)
-
-        try:
-            se = json.loads(row.get("student_eval_json") or "{}")
-        except Exception:
-            se = {}
-        try:
-            te = json.loads(row.get("teacher_eval_json") or "{}")
-        except Exception:
-            te = {}
-        try:
-            schedule = json.loads(row.get("study_schedule_json") or "{}")
-        except Exception:
-            schedule = {}
-
-        # 生徒自己評価
-        u = se.get("理解度")
-        g = se.get("目標達成度")
-        m = se.get("モチベーション")
-        if isinstance(u, (int, float)):
-            stu_understanding_list.append(u)
-            stu_understanding_series.append((d_str, u))
-        else:
-            stu_understanding_series.append((d_str, None))
-        if isinstance(g, (int, float)):
-            stu_goal_series.append((d_str, g))
-        else:
-            stu_goal_series.append((d_str, None))
-        if isinstance(m, (int, float)):
-            stu_motivation_series.append((d_str, m))
-        else:
-            stu_motivation_series.append((d_str, None))
-
-        # 講師評価
-        att = te.get("授業態度")
-        hw = te.get("宿題完成度")
-        prevu = te.get("前回理解度")
-        if isinstance(hw, (int, float)):
-            tch_homework_list.append(hw)
-
-        tch_attitude_series.append((d_str, att if isinstance(att, (int, float)) else None))
-        tch_homework_series.append((d_str, hw if isinstance(hw, (int, float)) else None))
-        tch_prev_understand_series.append((d_str, prevu if isinstance(prevu, (int, float)) else None))
-
-        # 自習予定から時間合計
-        for _, hrs in schedule.items():
-            try:
-                total_hours += float(hrs)
-            except Exception:
-                pass
-
-    avg_understanding = (
-        sum(stu_understanding_list) / len(stu_understanding_list)
-        if stu_understanding_list else 0
-    )
-    avg_homework = (
-        sum(tch_homework_list) / len(tch_homework_list)
-        if tch_homework_list else 0
+    # 集計本体はキャッシュされたヘルパーに任せる。書き込みがあると
+    # modifiedTime キャッシュが破棄されるので、その値をキーに含めて
+    # 同じ生徒・年月の再生成をメモ化する。
+    payload = _build_report_payload(
+        sid, int(year), int(month), get_spreadsheet_modified_time()
     )
-
-    # --- 英検情報 ---
-    eiken_df_student = eiken_df[eiken_df["student_id"] == sid].sort_values("practice_date")
-    has_eiken = not eiken_df_student.empty
-
-    current_target_grade = ""
-    current_exam_date = ""
-    month_eiken_rows = []
-
-    if has_eiken:
-        last = eiken_df_student.iloc[-1]
-        current_target_grade = last.get("target_grade", "")
-        current_exam_date = last.get("exam_date", "")
-
-        for _, row in eiken_df_student.iterrows():
-            try:
-                pd_ = datetime.fromisoformat(row["practice_date"]).date()
-            except Exception:
-                continue
-            if not (start_date <= pd_ < end_date):
-                continue
-
-            try:
-                s = json.loads(row.get("scores_json") or "{}")
-            except Exception:
-                s = {}
-
-            def get_skill(skill_key: str):
-                info = s.get(skill_key, {}) or {}
-                c = info.get("correct", 0)
-                t = info.get("total", 0)
-                rate = (c / t * 100) if t else 0
-                return c, t, rate
-
-            rd_c, rd_t, rd_r = get_skill("reading")
-            ls_c, ls_t, ls_r = get_skill("listening")
-            wr_c, wr_t, wr_r = get_skill("writing")
-            sp_c, sp_t, sp_r = get_skill("speaking")
-
-            month_eiken_rows.append(
-                {
-                    "演習日": row.get("practice_date", ""),
-                    "内容": row.get("category", ""),
-                    "R正解数": rd_c,
-                    "R正答率(%)": round(rd_r, 1),
-                    "L正解数": ls_c,
-                    "L正答率(%)": round(ls_r, 1),
-                    "W得点": wr_c,
-                    "W正答率(%)": round(wr_r, 1),
-                    "S得点": sp_c,
-                    "S正答率(%)": round(sp_r, 1),
-                }
-            )
-
-    # --- 成績（入塾〜現在：グラフ用） ---
-    exam_df_stu_all = exam_df[exam_df["student_id"] == sid].copy()
-    if not exam_df_stu_all.empty:
-        exam_df_stu_all["date_dt"] = pd.to_datetime(exam_df_stu_all["date"], errors="coerce")
-        exam_df_stu_all = exam_df_stu_all.sort_values("date_dt")
+    num_sessions = payload["num_sessions"]
+    total_hours = payload["total_hours"]
+    avg_understanding = payload["avg_understanding"]
+    avg_homework = payload["avg_homework"]
+    dates_list = payload["dates_list"]
+    stu_understanding_series = payload["stu_understanding_series"]
+    stu_goal_series = payload["stu_goal_series"]
+    stu_motivation_series = payload["stu_motivation_series"]
+    tch_attitude_series = payload["tch_attitude_series"]
+    tch_homework_series = payload["tch_homework_series"]
+    tch_prev_understand_series = payload["tch_prev_understand_series"]
+    has_eiken = payload["has_eiken"]
+    current_target_grade = payload["current_target_grade"]
+    current_exam_date = payload["current_exam_date"]
+    month_eiken_table = payload["month_eiken_table"]
+    exam_df_stu_all = payload["exam_df_stu_all"]
 
     # ---------- Plotly グラフを HTML に変換（カラー指定） ----------
-    fig1_html = ""
+    fig1_json = ""
     if dates_list:
         x1 = [d for d, _ in stu_understanding_series]
         y_u = [v for _, v in stu_understanding_series]
@@ -2902,9 +3460,9 @@ def page_parent_report():
             line=dict(color="#ff7f0e"), marker=dict(color="#ff7f0e")
         ))
         fig1.update_layout(yaxis=dict(range=[0, 5]), legend_title="項目")
-        fig1_html = fig1.to_html(include_plotlyjs=False, full_html=False)
+        fig1_json = fig1.to_json()
 
-    fig2_html = ""
+    fig2_json = ""
     if dates_list:
         x2 = [d for d, _ in tch_attitude_series]
         y_att = [v for _, v in tch_attitude_series]
@@ -2924,27 +3482,29 @@ def page_parent_report():
             line=dict(color="#17becf"), marker=dict(color="#17becf")
         ))
         fig2.update_layout(yaxis=dict(range=[0, 5]), legend_title="項目")
-        fig2_html = fig2.to_html(include_plotlyjs=False, full_html=False)
+        fig2_json = fig2.to_json()
 
-    fig_total_html = ""
+    fig_total_json = ""
     if not exam_df_stu_all.empty:
-        dates_exam = []
-        total_scores = []
-        total_targets = []
-        for _, row in exam_df_stu_all.iterrows():
-            label = f'{row["date"]} {row["exam_name"]}'
-            dates_exam.append(label)
-            try:
-                res = json.loads(row.get("results_json") or "{}")
-            except Exception:
-                res = {}
-            t_score = 0
-            t_target = 0
-            for _, vals in res.items():
-                t_score += vals.get("score", 0)
-                t_target += vals.get("target", 0)
-            total_scores.append(t_score)
-            total_targets.append(t_target)
+        # 行の Series 化も行ごとの json.loads もせず、展開済みの
+        # results.*.score / .target 数値列を行方向に合計する
+        dates_exam = (
+            exam_df_stu_all["date"].astype("string").fillna("")
+            + " "
+            + exam_df_stu_all["exam_name"].astype("string").fillna("")
+        ).tolist()
+        score_cols = [
+            c
+            for c in exam_df_stu_all.columns
+            if c.startswith("results.") and c.endswith(".score")
+        ]
+        target_cols = [
+            c
+            for c in exam_df_stu_all.columns
+            if c.startswith("results.") and c.endswith(".target")
+        ]
+        total_scores = exam_df_stu_all[score_cols].sum(axis=1).tolist()
+        total_targets = exam_df_stu_all[target_cols].sum(axis=1).tolist()
 
         fig_total = go.Figure()
         fig_total.add_trace(go.Scatter(
@@ -2958,71 +3518,65 @@ def page_parent_report():
             line=dict(color="#d62728", dash="dash"), marker=dict(color="#d62728")
         ))
         fig_total.update_layout(xaxis_title="テスト", yaxis_title="得点", legend_title="項目")
-        fig_total_html = fig_total.to_html(include_plotlyjs=False, full_html=False)
+        fig_total_json = fig_total.to_json()
 
     # ---------- テストを「テスト毎の表」でHTML化 ----------
     exam_table_html = ""
-    year_exam_rows = []
-    if not exam_df_stu_all.empty:
-        for _, row in exam_df_stu_all.iterrows():
-            try:
-                d = datetime.fromisoformat(row["date"]).date()
-            except Exception:
-                continue
-            if d.year == int(year):
-                year_exam_rows.append(row)
+    year_exam_df = payload["year_exam_df"]
 
-    if year_exam_rows:
+    if not year_exam_df.empty:
         parts = []
-        for row in year_exam_rows:
-            exam_label = f'{row["date"]} {row["exam_category"]} {row["exam_name"]}'
+        # 必要な列だけを zip で回す（行の Series 化・再パースをしない）
+        for d, cat, name, res in zip(
+            year_exam_df["date"],
+            year_exam_df["exam_category"],
+            year_exam_df["exam_name"],
+            year_exam_df["results_json_parsed"],
+        ):
+            exam_label = f"{d} {cat} {name}"
             parts.append(
                 f'<h4 class="subsection-title">{html.escape(exam_label)}</h4>'
             )
-            try:
-                res = json.loads(row.get("results_json") or "{}")
-            except Exception:
-                res = {}
+            res = res or {}
 
             if not res:
                 parts.append("<p>（科目データなし）</p>")
                 continue
 
-            subjects = []
-            targets = []
-            scores = []
-            for subj, vals in res.items():
-                subjects.append(subj)
-                targets.append(vals.get("target", 0))
-                scores.append(vals.get("score", 0))
-
-            df_exam = pd.DataFrame({
-                "科目": subjects,
-                "目標": targets,
-                "得点": scores,
-            })
+            # 科目数行の小さな表に to_html を都度呼ばず、文字列で直接組む
+            body_rows = "".join(
+                f"<tr><td>{html.escape(str(subj))}</td>"
+                f"<td>{vals.get('target', 0)}</td>"
+                f"<td>{vals.get('score', 0)}</td></tr>"
+                for subj, vals in res.items()
+            )
             parts.append(
-                df_exam.to_html(
-                    index=False,
-                    classes="score-table",
-                    border=0,
-                    justify="center",
-                    escape=False,
-                )
+                '<table class="score-table" border="0">'
+                "<thead><tr><th>科目</th><th>目標</th><th>得点</th></tr></thead>"
+                f"<tbody>{body_rows}</tbody></table>"
             )
         exam_table_html = "\n".join(parts)
     else:
         exam_table_html = "<p>今年度のテスト結果データがありません。</p>"
 
     # ---------- 英検テーブル ----------
-    if month_eiken_rows:
-        eiken_table_df = pd.DataFrame(month_eiken_rows)
-        eiken_table_html = eiken_table_df.to_html(
-            index=False,
-            classes="score-table",
-            border=0,
-            justify="center",
-            escape=False,
+    if not month_eiken_table.empty:
+        # 高々1か月分の小さな表に to_html を呼ばず、文字列で直接組む
+        header = "".join(
+            f"<th>{html.escape(str(c))}</th>" for c in month_eiken_table.columns
+        )
+        body = "".join(
+            "<tr>"
+            + "".join(
+                f"<td>{html.escape(v) if isinstance(v, str) else v}</td>"
+                for v in row
+            )
+            + "</tr>"
+            for row in month_eiken_table.itertuples(index=False, name=None)
+        )
+        eiken_table_html = (
+            '<table class="score-table" border="0">'
+            f"<thead><tr>{header}</tr></thead><tbody>{body}</tbody></table>"
         )
     else:
         eiken_table_html = "<p>この月の英検演習記録はありません。</p>"
@@ -3066,24 +3620,31 @@ def page_parent_report():
         """
     )
 
+    # 図は置き場所の div だけ挿入し、描画呼び出しは末尾の1つの
+    # <script> にまとめる（figure ごとの inline スクリプトを出さない）
+    figure_specs = []
+
     # ② 生徒自己評価
     sections.append('<div class="report-section-title">② 授業日報（生徒自己評価の推移）</div>')
-    if fig1_html:
-        sections.append(fig1_html)
+    if fig1_json:
+        sections.append('<div id="report-fig1"></div>')
+        figure_specs.append(("report-fig1", fig1_json))
     else:
         sections.append("<p>この月の授業日報はありません。</p>")
 
     # ③ 講師評価
     sections.append('<div class="report-section-title">③ 授業日報（講師評価の推移）</div>')
-    if fig2_html:
-        sections.append(fig2_html)
+    if fig2_json:
+        sections.append('<div id="report-fig2"></div>')
+        figure_specs.append(("report-fig2", fig2_json))
     else:
         sections.append("<p>この月の授業日報はありません。</p>")
 
     # ④ 成績推移
     sections.append('<div class="report-section-title">④ 成績推移（入塾〜現在）</div>')
-    if fig_total_html:
-        sections.append(fig_total_html)
+    if fig_total_json:
+        sections.append('<div id="report-fig-total"></div>')
+        figure_specs.append(("report-fig-total", fig_total_json))
     else:
         sections.append("<p>テスト結果データがありません。</p>")
 
@@ -3120,176 +3681,23 @@ def page_parent_report():
     else:
         sections.append("<p>（コメント未入力）</p>")
 
-    report_body = "\n".join(sections)
-
-    # ---------- iframe 内CSS（カラー＋印刷設定） ----------
-    css_block = """
-<style>
-@page {
-  size: A4 portrait;
-  margin: 5mm 8mm;
-}
-body {
-  margin: 0;
-  padding: 16px;
-  font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-  background: #f5f5f5;
-}
-.report-container {
-  max-width: 900px;
-  margin: 0 auto;
-  background: #ffffff;
-  padding: 24px 32px;
-  box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-  box-sizing: border-box;
-}
-.report-header {
-  font-size: 20px;
-  font-weight: 600;
-  margin-bottom: 16px;
-  border-bottom: 2px solid #4a90e2;
-  padding-bottom: 8px;
-}
-.report-section-title {
-  font-size: 16px;
-  font-weight: 600;
-  margin-top: 24px;
-  margin-bottom: 8px;
-  color: #333333;
-}
-.subsection-title {
-  font-size: 14px;
-  font-weight: 600;
-  margin-top: 16px;
-  margin-bottom: 4px;
-}
-.summary-grid {
-  display: flex;
-  flex-wrap: wrap;
-  gap: 8px;
-  margin-bottom: 8px;
-}
-.summary-item {
-  flex: 1 1 200px;
-  background: #f5f7ff;
-  border-radius: 8px;
-  padding: 8px 10px;
-}
-.summary-label {
-  font-size: 12px;
-  color: #555555;
-}
-.summary-value {
-  font-size: 16px;
-  font-weight: 600;
-  color: #222222;
-}
-.score-table {
-  border-collapse: collapse;
-  width: 100%;
-  font-size: 13px;
-  margin-top: 4px;
-}
-.score-table th,
-.score-table td {
-  border: 1px solid #cccccc;
-  padding: 4px 6px;
-}
-.score-table th {
-  background: #eef3ff;
-  font-weight: 600;
-}
-.toolbar {
-  display: flex;
-  gap: 8px;
-  margin-bottom: 12px;
-}
-.toolbar button {
-  padding: 6px 12px;
-  font-size: 13px;
-  border-radius: 6px;
-  border: none;
-  cursor: pointer;
-  background: #4a90e2;
-  color: #ffffff;
-}
-.toolbar button.secondary {
-  background: #777777;
-}
-.toolbar button:hover {
-  opacity: 0.9;
-}
-.plotly-graph-div, .js-plotly-plot {
-  max-width: 100% !important;
-}
-@media print {
-  body {
-    background: #ffffff;
-    -webkit-print-color-adjust: exact;
-    print-color-adjust: exact;
-  }
-  .toolbar {
-    display: none !important;
-  }
-}
-</style>
-"""
+    if figure_specs:
+        script_lines = []
+        for i, (div_id, fig_json) in enumerate(figure_specs, start=1):
+            script_lines.append(f"var figSpec{i} = {fig_json};")
+            script_lines.append(
+                f"Plotly.newPlot('{div_id}', figSpec{i}.data, figSpec{i}.layout);"
+            )
+        sections.append("<script>\n" + "\n".join(script_lines) + "\n</script>")
 
-    # ---------- iframe 全体 HTML（Plotly CDN + ボタン＋レポート） ----------
-    full_html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8" />
-<title>保護者向けレポート</title>
-{css_block}
-<script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-</head>
-<body>
-<div class="toolbar">
-  <button onclick="openInNewTab()" type="button">別タブでレポートを表示</button>
-  <button class="secondary" onclick="window.print()" type="button">
-    このレポートをPDFで保存 / 印刷
-  </button>
-</div>
-<div id="report-root" class="report-container">
-{report_body}
-</div>
+    report_body = "\n".join(sections)
 
-<script>
-function openInNewTab() {{
-  const reportRoot = document.getElementById('report-root');
-  if (!reportRoot) {{
-    alert('レポートが見つかりません。');
-    return;
-  }}
-  const newWin = window.open('', '_blank');
-  if (!newWin) {{
-    alert('ポップアップがブロックされています。');
-    return;
-  }}
-  newWin.document.write(`<!DOCTYPE html>
-<html>
-<head>
-<meta charset="utf-8" />
-<title>保護者向けレポート</title>
-{css_block}
-</head>
-<body>${{reportRoot.outerHTML}}</body>
-</html>`);
-  newWin.document.close();
-  newWin.focus();
-}}
-</script>
-</body>
-</html>
-"""
+    # ---------- iframe 全体 HTML（シェルは定数、差し込みは本文だけ） ----------
+    full_html = _REPORT_SHELL.replace("__BODY__", report_body)
 
     components.html(full_html, height=1100, scrolling=True)
 
 
-
-
 # -----------------
 # 講師アカウント管理（master専用）
 # -----------------
@@ -3346,10 +3754,9 @@ def page_teacher_management(current_username: str, current_role: str):
                 "password_hash": hashed,
                 "role": "teacher",
             }
-            users_df = pd.concat([users_df, pd.DataFrame([new_row])], ignore_index=True)
-            write_sheet_df("users", users_df)
-            st.success("講師アカウントを作成しました。")
-            time.sleep(1)
+            # 1行の追加は append だけで済ませる（concat での全体コピーをしない）
+            append_sheet_rows("users", [new_row])
+            _queue_flash("講師アカウントを作成しました。")
             st.rerun()
 
     # ---------------- パスワードリセット / アカウント削除 ----------------
@@ -3377,6 +3784,8 @@ def page_teacher_management(current_username: str, current_role: str):
             idx = users_df[users_df["username"] == selected_user].index[0]
             users_df.at[idx, "password_hash"] = hashed
             write_sheet_df("users", users_df)
+            if selected_user == MASTER_USERNAME:
+                get_master_password_hash.clear()
             st.success("パスワードを変更しました。")
 
     # アカウント削除
@@ -3386,14 +3795,13 @@ def page_teacher_management(current_username: str, current_role: str):
         st.info("master アカウントは削除できません。")
     else:
         if st.button("このアカウントを削除", key="delete_user"):
-            users_df = users_df[users_df["username"] != selected_user]
-            write_sheet_df("users", users_df)
-            st.success("アカウントを削除しました。")
-            time.sleep(1)
+            # 全行の絞り込み・再送をせず、対象の1行だけシートから削除する
+            row_pos = users_df.index[users_df["username"] == selected_user][0]
+            delete_sheet_row("users", row_pos)
+            _queue_flash("アカウントを削除しました。")
             st.rerun()
 
 
-
 # ==========
 # メイン関数
 # ==========
@@ -3406,11 +3814,9 @@ def main():
     inject_base_css()
 
     # ★ Google Sheets 初期化 & master ユーザー作成は
-    #   セッションごとに「最初の1回だけ」実行する
-    if "ubase_initialized" not in st.session_state:
-        init_sheets()        # シート有無チェック & 作成
-        ensure_master_user() # master ユーザーが無ければ作成
-        st.session_state["ubase_initialized"] = True
+    #   プロセス内で「最初の1回だけ」実行する（cache_resource で担保）
+    _sheets_initialized()  # シート有無チェック & 作成
+    _master_user_ensured() # master ユーザーが無ければ作成
 
     # 認証オブジェクト作成
     authenticator, roles_dict = build_authenticator()
@@ -3445,6 +3851,25 @@ def main():
     # ===== ここから先はログイン成功後 =====
     current_role = get_current_user_role(roles_dict, username)
 
+    # 保存・削除ハンドラが積んだ完了メッセージを rerun 後に表示
+    _show_flash()
+
+    # ログイン直後に全シートをバックグラウンドで先読みしてキャッシュを温める。
+    # 以降のページ遷移はウォームキャッシュに当たるので初回表示が速くなる。
+    if not st.session_state.get("sheets_prefetched"):
+        prefetch = threading.Thread(
+            target=lambda: [load_sheet_df(n) for n in SHEET_NAMES],
+            daemon=True,
+        )
+        try:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+            add_script_run_ctx(prefetch)
+        except Exception:
+            pass
+        prefetch.start()
+        st.session_state["sheets_prefetched"] = True
+
     # サイドバー
     st.sidebar.title("U-BASE メニュー")
     st.sidebar.markdown(f"**ログイン中:** {name}（{current_role}）")